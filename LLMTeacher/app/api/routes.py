@@ -1,14 +1,18 @@
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import Response
 from pydantic import BaseModel
+import json
+import logging
 import traceback
 from app.services.LLMFeedback import analyze_pronunciation_with_llm
 from app.services.GenerateFirstSentence import generate_first_sentence
 from app.services.GenerateAdvancedSentence import generate_advanced_sentence
 from app.services.PhonemeTTS import generate_phoneme_audio_bytes
+from app.services.BackendNotifier import notify_sentence_generated
 
 
 router = APIRouter()
+logger = logging.getLogger("llmteacher.api")
 
 class AlignmentResultsRequest(BaseModel):
     alignment_results: dict
@@ -31,27 +35,24 @@ async def health_check():
 @router.post("/analyze-pronunciation")
 async def analyze_pronunciation(request: AlignmentResultsRequest):
     try:
-        print(f"\n{'='*50}")
-        print(f"[ANALYZE-PRONUNCIATION] Received request")
-        print(f"[ANALYZE-PRONUNCIATION] Alignment results: {request.alignment_results}")
-        print(f"{'='*50}\n")
-        
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(json.dumps({"event": "analyze_request", "alignment_results": request.alignment_results}, ensure_ascii=False))
+
         result = analyze_pronunciation_with_llm(request.alignment_results)
-        
-        print(f"\n{'='*50}")
-        print(f"[ANALYZE-PRONUNCIATION] LLM Result: {result}")
-        print(f"{'='*50}\n")
-        
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(json.dumps({"event": "analyze_result", "result": result}, ensure_ascii=False))
+
         return result
     except Exception as e:
-        print(f"\n[ANALYZE-PRONUNCIATION] ERROR: {str(e)}")
-        print(f"[ANALYZE-PRONUNCIATION] TRACEBACK: {traceback.format_exc()}")
+        logger.exception("analyze-pronunciation failed: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
     
 @router.post("/generate-first-sentence")
 async def generate_first_sentence_route():
     try:
         result = generate_first_sentence()
+        notify_sentence_generated(result)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -71,6 +72,7 @@ async def generate_advanced_sentence_route(request: AdvancedSentenceRequest):
             request.previous_sentence,
             feedback
         )
+        notify_sentence_generated(result)
         return result
     except Exception as e:
         print(f"Error processing request: {e}")  # Debug line
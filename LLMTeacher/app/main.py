@@ -1,9 +1,17 @@
+import logging
+import os
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.routes import router as api_router
 import sys
 from app.tests.APIKeysTest import test_env_keys_exist
 
+# Request and LLM payloads are logged at DEBUG; LOG_LEVEL=DEBUG turns them on
+logging.basicConfig(
+    level=os.environ.get("LOG_LEVEL", "WARNING").upper(),
+    format="%(asctime)s %(levelname)s %(name)s %(message)s",
+)
+
 
 try:
     test_env_keys_exist()
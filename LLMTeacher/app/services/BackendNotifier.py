@@ -0,0 +1,35 @@
+import asyncio
+import logging
+import os
+import httpx
+
+BACKEND_URL = os.getenv("BACKEND_URL", "http://backend:8000")
+# Tell the backend about new sentences so it can render their audio before the user asks
+PRERENDER_NOTIFY = os.getenv("PRERENDER_NOTIFY", "1") == "1"
+PRERENDER_NOTIFY_TIMEOUT = float(os.getenv("PRERENDER_NOTIFY_TIMEOUT", 2))
+
+logger = logging.getLogger("llmteacher.notify")
+_tasks = set()
+
+
+async def _notify(sentence, sentence_ipa):
+    try:
+        async with httpx.AsyncClient(base_url=BACKEND_URL, timeout=PRERENDER_NOTIFY_TIMEOUT) as client:
+            response = await client.post("/tts/prerender", json={"sentence": sentence, "sentence_ipa": sentence_ipa})
+            response.raise_for_status()
+    except httpx.HTTPError as e:
+        logger.warning("TTS prerender notification failed: %s", e)
+
+
+def notify_sentence_generated(result):
+    """
+    Ask the backend to pre-render TTS for a generated sentence, without waiting for the answer.
+    """
+    if not PRERENDER_NOTIFY or not isinstance(result, dict):
+        return
+    sentence = result.get("sentence")
+    if not sentence or sentence == "Error generating sentence.":
+        return
+    task = asyncio.create_task(_notify(sentence, result.get("sentence_ipa")))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
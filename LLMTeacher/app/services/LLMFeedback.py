@@ -1,5 +1,6 @@
 import os
 import json
+import logging
 import requests
 from dotenv import load_dotenv
 
@@ -12,12 +13,11 @@ OPEN_ROUTER_API_KEY = os.getenv("OPEN_ROUTER_API_KEY")
 if not OPEN_ROUTER_API_KEY:
     raise ValueError("OpenRouter API key not found. Please set it in the .env file.")
 
+logger = logging.getLogger("llmteacher.feedback")
+
 
 def analyze_pronunciation_with_llm(alignment_results):
-    print(f"\n{'='*50}")
-    print(f"[LLMFeedback] Starting pronunciation analysis")
-    print(f"[LLMFeedback] Input alignment_results: {alignment_results}")
-    print(f"{'='*50}\n")
+    logger.debug("Starting pronunciation analysis")
 
     # Define the system and user messages for the LLM
     system_message = (
@@ -63,8 +63,7 @@ def analyze_pronunciation_with_llm(alignment_results):
     "- Return ONLY the raw JSON object with no additional commentary."
 )
     # API call to OpenRouter (openai/gpt-oss-20b:free)
-    print(f"[LLMFeedback] Sending request to OpenRouter API...")
-    print(f"[LLMFeedback] Model: openai/gpt-oss-20b:free")
+    logger.debug("Sending request to OpenRouter API, model openai/gpt-oss-20b:free")
     try:
         response = requests.post(
             "https://openrouter.ai/api/v1/chat/completions",
@@ -85,26 +84,23 @@ def analyze_pronunciation_with_llm(alignment_results):
                 "top_p": 1.0
             }
         )
-        print(f"[LLMFeedback] Response status code: {response.status_code}")
+        logger.debug("Response status code: %s", response.status_code)
         response.raise_for_status()
         result = response.json()
         
-        print(f"[LLMFeedback] Raw API response: {result}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(json.dumps({"event": "llm_raw_response", "response": result}, ensure_ascii=False))
         
         # Extract response content
         response_text = result.get("choices", [{}])[0].get("message", {}).get("content", "")
-        print(f"[LLMFeedback] Extracted response_text: {response_text}")
         
         # Clean up response if wrapped in markdown code blocks
         if response_text.startswith("```json"):
-            print(f"[LLMFeedback] Cleaning up markdown json wrapper")
             response_text = response_text.replace("```json", "").replace("```", "").strip()
         elif response_text.startswith("```"):
-            print(f"[LLMFeedback] Cleaning up markdown wrapper")
             response_text = response_text.replace("```", "").strip()
         
-        print(f"[LLMFeedback] Final cleaned response: {response_text}")
-        print(f"{'='*50}\n")
+        logger.debug("Cleaned response: %s", response_text)
         
         return {
             "choices": [{
@@ -114,8 +110,5 @@ def analyze_pronunciation_with_llm(alignment_results):
             }]
         }
     except requests.exceptions.RequestException as e:
-        print(f"\n{'='*50}")
-        print(f"[LLMFeedback] ERROR in OpenRouter API call: {e}")
-        print(f"[LLMFeedback] Response content: {getattr(e.response, 'text', 'N/A') if hasattr(e, 'response') else 'N/A'}")
-        print(f"{'='*50}\n")
+        logger.error("OpenRouter API call failed: %s; response: %s", e, getattr(e.response, 'text', 'N/A') if hasattr(e, 'response') else 'N/A')
         raise ValueError("Failed to get a response from the LLM.")
\ No newline at end of file
@@ -2,10 +2,15 @@ import os
 import azure.cognitiveservices.speech as speechsdk
 from dotenv import load_dotenv
 import tempfile
+from collections import OrderedDict
 
 # Load environment variables
 load_dotenv()
 
+# Recently generated phoneme audio, so words pre-rendered for a new sentence play back instantly
+PHONEME_AUDIO_CACHE_SIZE = int(os.getenv("PHONEME_AUDIO_CACHE_SIZE", 512))
+_phoneme_audio_cache = OrderedDict()
+
 class PhonemeTTS:
     def __init__(self):
         """Initialize Azure Speech SDK with credentials from environment variables."""
@@ -110,5 +115,14 @@ async def generate_phoneme_audio_bytes(phonetic_word: str) -> bytes:
     Returns:
         bytes: Audio data as bytes
     """
+    audio_data = _phoneme_audio_cache.get(phonetic_word)
+    if audio_data is not None:
+        _phoneme_audio_cache.move_to_end(phonetic_word)
+        return audio_data
+
     tts = PhonemeTTS()
-    return await tts.generate_phoneme_audio_blob(phonetic_word)
\ No newline at end of file
+    audio_data = await tts.generate_phoneme_audio_blob(phonetic_word)
+    _phoneme_audio_cache[phonetic_word] = audio_data
+    while len(_phoneme_audio_cache) > PHONEME_AUDIO_CACHE_SIZE:
+        _phoneme_audio_cache.popitem(last=False)
+    return audio_data
\ No newline at end of file
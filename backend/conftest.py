@@ -0,0 +1 @@
+# Lets tests import the backend's `services` package the way main.py does
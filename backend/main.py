@@ -1,8 +1,34 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from routes import analysis, tts, translate
+import asyncio
+from routes import analysis, stream, tts, translate, health, debug
+from services import executors
+from services.model_manager import model_manager
+from services.result_cache import result_cache
+from services.llm_client import llm_teacher
+from services.tracing import trace_buffer
+from services.tts_prerender import tts_prerenderer
+from services.translate_service import translation_cache
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app):
+    # Load and warm the model in the background so /health/live answers immediately;
+    # /health/ready reports when the model can take traffic.
+    startup = asyncio.create_task(model_manager.start())
+    await llm_teacher.start()
+    yield
+    startup.cancel()
+    tts_prerenderer.close()
+    await llm_teacher.close()
+    trace_buffer.close()
+    result_cache.close()
+    translation_cache.close()
+    executors.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -11,9 +37,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allow all HTTP methods
     allow_headers=["*"],  # Allow all headers
+    expose_headers=["X-TTS-Id"],  # Lets the frontend fetch TTS word boundaries
 )
 
 # Include routers
 app.include_router(analysis.router, prefix="/analysis", tags=["Analysis"])
+app.include_router(stream.router, prefix="/analysis", tags=["Analysis"])
 app.include_router(tts.router, prefix="/tts", tags=["Text-to-Speech"])
 app.include_router(translate.router, prefix="/translate", tags=["Translate"])
+app.include_router(health.router, prefix="/health", tags=["Health"])
+app.include_router(debug.router, prefix="/debug", tags=["Debug"])
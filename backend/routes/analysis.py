@@ -1,50 +1,259 @@
 from fastapi import APIRouter, File, Form, UploadFile
 from fastapi.responses import JSONResponse
-from services.wav2vec_service import convert_audio_file
-import os
+from routes.sse import sse_event, sse_response
+from services.wav2vec_service import SCORING_MODE, SCORING_MODES, parse_ipa_variants, score_transcription, transcribe_audio
+from services.logits_cache import UnknownAudioId, audio_id, logits_cache
+from services.result_cache import cache_key, result_cache
+from services.feedback_service import LLM_ENRICHMENT, as_chat_response, get_enrichment, local_feedback, start_enrichment, wait_enrichment
+from services.inference_scheduler import InferenceQueueFull
+from services.model_manager import ModelNotReady, model_manager
+from services.tracing import get_logger, log_event, trace_buffer
+from services.audio_ingest import SAMPLING_RATE, AudioIngestError, read_upload, decode_audio
+import asyncio
 import json
-import requests
+import logging
+import time
 
 router = APIRouter()
+logger = get_logger("analysis")
+
+
+class AnalysisRequest:
+    """
+    Validated /analysis form fields, shared by the JSON and the event-stream endpoints.
+    """
+
+    def __init__(self, sentence, sentenceIPA, audioId, scoringMode, word_variants, enrich):
+        self.sentence = sentence
+        self.sentenceIPA = sentenceIPA
+        self.audio_id = audioId
+        self.audio_bytes = None
+        self.scoring_mode = scoringMode
+        self.word_variants = word_variants
+        self.enrich = LLM_ENRICHMENT if enrich is None else enrich
+
+    @classmethod
+    def parse(cls, sentence, sentenceIPA, audio, audioId, scoringMode, ipaVariants, llmEnrichment):
+        """
+        Returns the request, or a 400 JSONResponse describing what is wrong with it.
+        """
+        if scoringMode is not None and scoringMode not in SCORING_MODES:
+            return JSONResponse(status_code=400, content={"error": f"scoringMode must be one of {', '.join(SCORING_MODES)}"})
+        if audio is None and audioId is None:
+            return JSONResponse(status_code=400, content={"error": "Send either an audio upload or the audioId of a recent one"})
+        try:
+            word_variants = parse_ipa_variants(sentenceIPA, json.loads(ipaVariants)) if ipaVariants else None
+        except ValueError as e:
+            return JSONResponse(status_code=400, content={"error": f"Invalid ipaVariants: {e}"})
+        return cls(sentence, sentenceIPA, audioId, scoringMode, word_variants, llmEnrichment)
+
+    async def read_audio(self, audio):
+        if audio is not None:
+            self.audio_bytes = await read_upload(audio)
+            self.audio_id = audio_id(self.audio_bytes)
+
+    @property
+    def key(self):
+        # Identical requests (retries, double submits) share one analysis
+        return cache_key(self.audio_id, self.sentence, self.sentenceIPA, self.scoring_mode or SCORING_MODE,
+                         self.word_variants, self.enrich)
+
+
+async def analysis_stages(request):
+    """
+    Run an analysis, yielding (stage, data) as each stage completes:
+    decoded, transcribed, aligned and finally feedback with the full /analysis response.
+    """
+    timings = {}
+    start = time.perf_counter()
+    transcribed = logits_cache.get(request.audio_id)
+    if transcribed is None:
+        if request.audio_bytes is None:
+            raise UnknownAudioId("Unknown or expired audioId; upload the recording again")
+        # Decode the upload in memory to a 16 kHz mono waveform
+        audio_input = await decode_audio(request.audio_bytes)
+        timings["decode"] = time.perf_counter() - start
+        yield "decoded", {"audio_id": request.audio_id, "audio_seconds": len(audio_input) / SAMPLING_RATE}
+        start = time.perf_counter()
+        transcribed = await transcribe_audio(audio_input)
+        timings["transcribe"] = time.perf_counter() - start
+        logits_cache.put(request.audio_id, transcribed)
+    else:
+        yield "decoded", {"audio_id": request.audio_id, "audio_seconds": transcribed[2]["original_seconds"]}
+
+    transcription, logits, speech = transcribed
+    yield "transcribed", {"phonemes": transcription, "speech_seconds": speech["trimmed_seconds"]}
+    start = time.perf_counter()
+
+    wav2vec_result = await score_transcription(
+        transcription, logits, request.sentenceIPA, request.sentence,
+        request.scoring_mode, request.word_variants, speech,
+    )
+
+    timings["align"] = time.perf_counter() - start
+    log_event(logger, logging.DEBUG, "aligned", analysis_id=request.key, result=wav2vec_result)
+    yield "aligned", wav2vec_result
+
+    # Feedback is computed locally; LLMTeacher feedback is an optional background extra
+    response = as_chat_response(local_feedback(wav2vec_result))
+    response["analysis_id"] = request.key
+    # Per-word similarity, plus timestamps and confidence (ctc) or the matched variant (ipaVariants)
+    response["word_alignments"] = wav2vec_result["word_alignments"]
+    if request.enrich:
+        await start_enrichment(request.key, wav2vec_result)
+
+    # audio_id lets the client re-score this recording without uploading it again
+    response["audio_id"] = request.audio_id
+    response["audio_seconds"] = speech["original_seconds"]
+    response["speech_seconds"] = speech["trimmed_seconds"]
+
+    trace_buffer.record(
+        "analysis",
+        analysis_id=request.key,
+        audio_id=request.audio_id,
+        sentence=request.sentence,
+        sentence_ipa=request.sentenceIPA,
+        scoring_mode=request.scoring_mode or SCORING_MODE,
+        phonemes=transcription,
+        word_alignments=wav2vec_result["word_alignments"],
+        feedback=response["choices"][0]["message"]["content"],
+        timings=timings,
+    )
+    yield "feedback", response
+
+
+def _error_response(e, request=None):
+    if request is not None:
+        trace_buffer.record("analysis_error", audio_id=request.audio_id, sentence=request.sentence, error=repr(e))
+    if isinstance(e, UnknownAudioId):
+        return 404, str(e)
+    if isinstance(e, AudioIngestError):
+        return e.status_code, str(e)
+    if isinstance(e, (InferenceQueueFull, ModelNotReady)):
+        return 503, str(e)
+    return 500, str(e)
 
 
 @router.post("/")
 async def analyze_audio(
     sentence: str = Form(...),
     sentenceIPA: str = Form(...),
-    audio: UploadFile = File(...),
+    audio: UploadFile = File(None),
+    audioId: str = Form(None),
+    scoringMode: str = Form(None),
+    ipaVariants: str = Form(None),
+    llmEnrichment: bool = Form(None),
 ):
+    request = AnalysisRequest.parse(sentence, sentenceIPA, audio, audioId, scoringMode, ipaVariants, llmEnrichment)
+    if isinstance(request, JSONResponse):
+        return request
     try:
-        # Save input audio and transcript files
-        audio_path = f"temp_{audio.filename}"
-        with open(audio_path, "wb") as f:
-            f.write(await audio.read())
-
-        wav2vec_result = await convert_audio_file(audio_path, sentenceIPA, sentence)
+        await request.read_audio(audio)
 
-        wav2vec_output_path = os.path.join("services", "wav2vec_transcription.json")
-        with open(wav2vec_output_path, "w") as f:
-            json.dump(wav2vec_result, f, indent=4)
+        async def analyze():
+            async for _, data in analysis_stages(request):
+                pass
+            return data
 
-        print("Wav2Vec Transcription Results:", wav2vec_result)
-
-        # Analyze pronunciation with LLM via LLMTeacher microservice
-        try:
-            response = requests.post(
-                "http://llmteacher:5000/analyze-pronunciation",
-                json={"alignment_results": wav2vec_result},
-                timeout=30
-            )
-            response.raise_for_status()
-            llm_feedback = response.json()
-        except Exception as e:
-            print("Error communicating with LLMTeacher:", e)
-            llm_feedback = {"error": "Failed to get feedback from LLMTeacher."}
+        result = await result_cache.get_or_compute(request.key, analyze)
+        if request.enrich:
+            # Not part of the cached body: a retry reports the enrichment's current state
+            result["llm_feedback"], _ = await get_enrichment(request.key)
 
         # Return a success response
         return JSONResponse(
-            llm_feedback,
+            result,
             status_code=200,
         )
     except Exception as e:
-        return JSONResponse(status_code=500, content={"error": str(e)})
+        status_code, error = _error_response(e, request)
+        return JSONResponse(status_code=status_code, content={"error": error})
+
+
+@router.post("/events")
+async def analyze_audio_events(
+    sentence: str = Form(...),
+    sentenceIPA: str = Form(...),
+    audio: UploadFile = File(None),
+    audioId: str = Form(None),
+    scoringMode: str = Form(None),
+    ipaVariants: str = Form(None),
+    llmEnrichment: bool = Form(None),
+):
+    """
+    Same analysis as POST /analysis, streamed as Server-Sent Events: decoded, transcribed
+    (the phonemes), aligned (the word alignments) and feedback (the /analysis response),
+    then llm_feedback if LLM enrichment was requested. Failures end the stream with an error event.
+    A cached analysis, or one already running for an identical request, is sent as a single feedback event.
+    """
+    request = AnalysisRequest.parse(sentence, sentenceIPA, audio, audioId, scoringMode, ipaVariants, llmEnrichment)
+    if isinstance(request, JSONResponse):
+        return request
+    try:
+        await request.read_audio(audio)
+    except AudioIngestError as e:
+        return JSONResponse(status_code=e.status_code, content={"error": str(e)})
+
+    async def events():
+        stages = asyncio.Queue()
+
+        async def analyze():
+            async for stage, data in analysis_stages(request):
+                if stage != "feedback":
+                    stages.put_nowait((stage, data))
+            return data
+
+        def analyzed(task):
+            stages.put_nowait(None)
+            # Mark a failure retrieved in case the client has already gone
+            if not task.cancelled():
+                task.exception()
+
+        # Joins a cached or in-flight analysis of the same request (JSON or events) like
+        # POST /analysis does; only the analysis that actually runs streams its stages.
+        # It runs in its own task, so it still completes if the client disconnects.
+        analysis = asyncio.ensure_future(result_cache.get_or_compute(request.key, analyze))
+        analysis.add_done_callback(analyzed)
+        try:
+            while (item := await stages.get()) is not None:
+                yield sse_event(*item)
+            yield sse_event("feedback", await analysis)
+            if request.enrich:
+                state, llm_feedback = await wait_enrichment(request.key)
+                if state == "ready":
+                    yield sse_event("llm_feedback", llm_feedback)
+                else:
+                    yield sse_event("llm_feedback", {"error": f"Failed to get feedback from LLMTeacher: {llm_feedback}"})
+        except Exception as e:
+            status_code, error = _error_response(e, request)
+            yield sse_event("error", {"status": status_code, "error": error})
+
+    return sse_response(events())
+
+
+@router.get("/inference-stats")
+async def inference_stats():
+    if model_manager.scheduler is None:
+        return JSONResponse(status_code=503, content={"error": "Model is not loaded"})
+    return model_manager.scheduler.stats()
+
+
+@router.get("/llm-feedback/{analysis_id}")
+async def llm_feedback(analysis_id: str):
+    """
+    LLMTeacher feedback for an analysis that was sent with llmEnrichment: 202 while it is
+    running, 502 once it has failed.
+    """
+    state, feedback = await get_enrichment(analysis_id)
+    if state == "ready":
+        return feedback
+    if state == "pending":
+        return JSONResponse(status_code=202, content={"status": "pending"})
+    if state == "failed":
+        return JSONResponse(status_code=502, content={"status": "failed", "error": feedback})
+    return JSONResponse(status_code=404, content={"error": "No LLM feedback for this analysis"})
+
+
+@router.get("/cache-stats")
+async def cache_stats():
+    return result_cache.stats()
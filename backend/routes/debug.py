@@ -0,0 +1,16 @@
+import os
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from services.tracing import trace_buffer
+
+# Traces contain learners' sentences and phonemes, so they are only served with DEBUG_ENDPOINTS=1
+DEBUG_ENDPOINTS = os.environ.get("DEBUG_ENDPOINTS", "0") == "1"
+
+router = APIRouter()
+
+
+@router.get("/traces")
+async def traces(limit: int = 20, kind: str = None):
+    if not DEBUG_ENDPOINTS:
+        return JSONResponse(status_code=404, content={"error": "Debug endpoints are disabled"})
+    return {"stats": trace_buffer.stats(), "traces": trace_buffer.recent(limit, kind)}
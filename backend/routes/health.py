@@ -0,0 +1,16 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from services.model_manager import model_manager
+
+router = APIRouter()
+
+
+@router.get("/live")
+async def live():
+    return {"status": "alive"}
+
+
+@router.get("/ready")
+async def ready():
+    status = model_manager.status()
+    return JSONResponse(status, status_code=200 if model_manager.ready else 503)
@@ -0,0 +1,18 @@
+import json
+from fastapi.responses import StreamingResponse
+
+
+def sse_event(event, data):
+    """
+    One Server-Sent Event with a JSON payload.
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def sse_response(events):
+    """
+    Stream the sse_event strings of an async iterator. Proxies are told not to buffer,
+    so each event reaches the client as soon as it is sent.
+    """
+    return StreamingResponse(events, media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -0,0 +1,53 @@
+import json
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from services.audio_ingest import AudioIngestError
+from services.inference_scheduler import InferenceQueueFull
+from services.model_manager import ModelNotReady, model_manager
+from services.stream_session import StreamSession
+
+router = APIRouter()
+
+
+@router.websocket("/stream")
+async def analyze_stream(websocket: WebSocket):
+    """
+    Live pronunciation analysis.
+
+    1. The client sends a JSON text message:
+       {"sentence": ..., "sentenceIPA": ..., "format": "f32le" | "s16le"}
+    2. It then streams raw 16 kHz mono PCM in binary messages while the user speaks.
+       The server answers with {"type": "partial", "phonemes": ..., "word_alignments": [...]}
+       whenever new audio has been transcribed.
+    3. It sends {"type": "end"} when recording stops, and receives
+       {"type": "final", "sentence": ..., "phonemes": ..., "word_alignments": [...]}.
+    Errors are reported as {"type": "error", "error": ...} before the socket closes.
+    """
+    await websocket.accept()
+    try:
+        start = await websocket.receive_json()
+        session = StreamSession(
+            start["sentence"],
+            start["sentenceIPA"],
+            model_manager.require_scheduler(),
+            model_manager.engine.config,
+            pcm_format=start.get("format", "f32le"),
+        )
+        await websocket.send_json({"type": "ready"})
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("bytes") is not None:
+                session.append(message["bytes"])
+                if await session.advance():
+                    await websocket.send_json({"type": "partial", **await session.partial()})
+            elif message.get("text") is not None and json.loads(message["text"]).get("type") == "end":
+                break
+        await websocket.send_json({"type": "final", **await session.finish()})
+        await websocket.close()
+    except WebSocketDisconnect:
+        return
+    except (KeyError, ValueError, AudioIngestError, InferenceQueueFull, ModelNotReady) as e:
+        message = f"Missing field {e}" if isinstance(e, KeyError) else str(e)
+        await websocket.send_json({"type": "error", "error": message})
+        await websocket.close(code=1008 if isinstance(e, (KeyError, ValueError)) else 1013)
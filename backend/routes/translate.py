@@ -1,13 +1,38 @@
+from typing import List
 from fastapi import APIRouter, Body
 from fastapi.responses import JSONResponse
-from services.translate_service import translate_to_hebrew
+from services.translate_service import TRANSLATION_MAX_BATCH, translate, translate_batch, translation_cache
 
 router = APIRouter()
 
 @router.post("/")
-async def translate(sentence: str = Body(..., embed=True)):
+async def translate_sentence(
+    sentence: str = Body(..., embed=True),
+    src: str = Body("en", embed=True),
+    dest: str = Body("he", embed=True),
+):
     try:
-        hebrew = translate_to_hebrew(sentence)
-        return JSONResponse({"translation": hebrew})
+        translation = await translate(sentence, src=src, dest=dest)
+        return JSONResponse({"translation": translation})
     except Exception as e:
-        return JSONResponse({"error": str(e)}, status_code=500)
\ No newline at end of file
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+@router.post("/batch")
+async def translate_sentences(
+    sentences: List[str] = Body(..., embed=True),
+    src: str = Body("en", embed=True),
+    dest: str = Body("he", embed=True),
+):
+    if len(sentences) > TRANSLATION_MAX_BATCH:
+        return JSONResponse({"error": f"At most {TRANSLATION_MAX_BATCH} sentences per batch"}, status_code=413)
+    try:
+        translations = await translate_batch(sentences, src=src, dest=dest)
+        return JSONResponse({"translations": translations})
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+@router.get("/cache-stats")
+async def translation_cache_stats():
+    return translation_cache.stats()
@@ -1,17 +1,121 @@
+import base64
+import re
+from typing import Optional
 from fastapi import APIRouter, Form
-from fastapi.responses import FileResponse, JSONResponse
-from services.tts_service import generate_tts_audio
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from routes.sse import sse_event, sse_response
+from services.tts_cache import tts_cache
+from services.tts_prerender import tts_prerenderer
+from services.tts_service import TTS_MEDIA_TYPE, UnknownWord, generate_tts_audio, stream_tts_audio, stream_tts_events, tts_id, word_clip
 from pydantic import BaseModel
 router = APIRouter()
 
+_TTS_ID = re.compile(r"[0-9a-f]{64}")
+
 
 class SentenceRequest(BaseModel):
     sentence: str
 
+
+class PrerenderRequest(BaseModel):
+    sentence: str
+    sentence_ipa: Optional[str] = None
+
+
+class WordClipRequest(BaseModel):
+    sentence: str
+    word: str
+    occurrence: int = 0
+
 @router.post("/")
 async def tts(request: SentenceRequest):
     try:
-        audio_path = await generate_tts_audio(request.sentence)
-        return FileResponse(audio_path, media_type="audio/wav", filename="output.wav")
+        speech = await generate_tts_audio(request.sentence)
+        return Response(
+            content=speech["audio"],
+            media_type=TTS_MEDIA_TYPE,
+            headers={"Content-Disposition": 'inline; filename="output.mp3"', "X-TTS-Id": tts_id(request.sentence)},
+        )
+    except Exception as e:
+        return JSONResponse(content={"error": str(e)}, status_code=500)
+
+
+@router.post("/stream")
+async def tts_stream(request: SentenceRequest):
+    """
+    Same audio as POST /tts, sent chunk by chunk while it is synthesized.
+    Word boundaries are available from GET /tts/boundaries/{X-TTS-Id} once the stream ends;
+    use POST /tts/events to receive them during playback.
+    """
+    return StreamingResponse(
+        stream_tts_audio(request.sentence),
+        media_type=TTS_MEDIA_TYPE,
+        headers={"X-TTS-Id": tts_id(request.sentence), "Cache-Control": "no-cache"},
+    )
+
+
+@router.post("/events")
+async def tts_events(request: SentenceRequest):
+    """
+    The streamed audio and its word boundaries in one Server-Sent Event stream, in the order
+    Edge TTS produces them: word events ({text, start, end} in seconds) and audio events
+    (base64 MP3 chunks), then end, or error if synthesis fails.
+    """
+    async def events():
+        try:
+            async for kind, value in stream_tts_events(request.sentence):
+                if kind == "audio":
+                    yield sse_event("audio", base64.b64encode(value).decode())
+                else:
+                    yield sse_event("word", value)
+            yield sse_event("end", {"tts_id": tts_id(request.sentence)})
+        except Exception as e:
+            yield sse_event("error", {"error": str(e)})
+
+    return sse_response(events())
+
+
+@router.post("/word")
+async def tts_word(request: WordClipRequest):
+    """
+    One word of a sentence, cut from the sentence's cached speech.
+    """
+    try:
+        clip = await word_clip(request.sentence, request.word, request.occurrence)
+        return Response(content=clip, media_type=TTS_MEDIA_TYPE)
+    except UnknownWord as e:
+        return JSONResponse(content={"error": str(e)}, status_code=404)
     except Exception as e:
-        return JSONResponse(content={"error": str(e)}, status_code=500)
\ No newline at end of file
+        return JSONResponse(content={"error": str(e)}, status_code=500)
+
+
+@router.get("/boundaries/{tts_id}")
+async def tts_boundaries(tts_id: str):
+    """
+    Word start and end times (seconds) of synthesized speech: 202 while it is still being synthesized.
+    """
+    speech = await tts_cache.get(tts_id) if _TTS_ID.fullmatch(tts_id) else None
+    if speech is not None:
+        return {"boundaries": speech["boundaries"]}
+    if tts_cache.pending(tts_id):
+        return JSONResponse(status_code=202, content={"status": "pending"})
+    return JSONResponse(status_code=404, content={"error": "No speech with this id"})
+
+
+@router.post("/prerender")
+async def tts_prerender(request: PrerenderRequest):
+    """
+    Render a newly generated sentence (and its words' phoneme audio) into the caches in the background.
+    """
+    queued = tts_prerenderer.submit(request.sentence, request.sentence_ipa)
+    return JSONResponse(status_code=202, content={"queued": queued})
+
+
+@router.get("/prerender-stats")
+async def tts_prerender_stats():
+    return tts_prerenderer.stats()
+
+
+@router.get("/cache-stats")
+async def tts_cache_stats():
+    return tts_cache.stats()
@@ -0,0 +1,124 @@
+"""
+Pre-fork multi-worker server for the backend.
+
+    python serve.py --workers 4 --port 8000
+
+The parent process loads the model once, moves its weights into shared memory and then
+forks the workers, so every worker maps the same read-only weights instead of loading its
+own copy. Each worker runs its own event loop, warms up and serves /analysis on the shared
+listening socket. Torch intra-op threads are split between workers so that together they
+use each core once.
+"""
+import argparse
+import os
+import signal
+import socket
+import sys
+import torch
+import uvicorn
+
+WEB_WORKERS = int(os.environ.get("WEB_WORKERS", 2))
+# Shared result cache used when several workers run and RESULT_CACHE_PATH is not set
+SHARED_RESULT_CACHE_PATH = "result_cache.sqlite3"
+
+
+def _threads_per_worker(workers):
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+def _preload_model():
+    from services.inference_engine import INFERENCE_ENGINE, TorchEngine
+    from services.model_manager import model_manager
+
+    if INFERENCE_ENGINE == "onnx":
+        # ONNX Runtime sessions own thread pools that do not survive fork; each worker loads its own
+        print("INFERENCE_ENGINE=onnx: the model is loaded in each worker, not shared")
+        return
+    model_manager.load()
+    if isinstance(model_manager.engine, TorchEngine) and model_manager.engine.device.type == "cpu":
+        # Parameter storages move to shared memory; forked workers map the same pages
+        model_manager.engine.model.share_memory()
+
+
+def _run_worker(sock, args, threads):
+    torch.set_num_threads(threads)
+    import main
+
+    config = uvicorn.Config(main.app, host=args.host, port=args.port, log_level=args.log_level)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def _spawn(sock, args, threads):
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        code = 0
+        try:
+            _run_worker(sock, args, threads)
+        except BaseException as e:
+            print(f"Worker {os.getpid()} crashed: {e}")
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=WEB_WORKERS)
+    parser.add_argument("--threads-per-worker", type=int, default=None,
+                        help="torch intra-op threads per worker (default: cores / workers)")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+    threads = args.threads_per_worker or _threads_per_worker(args.workers)
+    if args.workers > 1 and not os.environ.get("RESULT_CACHE_PATH"):
+        # LLM enrichment state is polled from whichever worker gets the request, so the
+        # result cache needs its shared SQLite tier. Set before any worker imports it.
+        os.environ["RESULT_CACHE_PATH"] = SHARED_RESULT_CACHE_PATH
+
+    # Keep the parent single-threaded: forking after an OpenMP pool has started can hang the children
+    torch.set_num_threads(1)
+    _preload_model()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    print(f"Starting {args.workers} workers with {threads} torch threads each on {args.host}:{args.port}")
+    workers = {_spawn(sock, args, threads) for _ in range(args.workers)}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        workers.discard(pid)
+        if not stopping:
+            print(f"Worker {pid} exited with status {status}; restarting it")
+            workers.add(_spawn(sock, args, threads))
+    sock.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
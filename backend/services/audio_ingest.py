@@ -0,0 +1,67 @@
+import asyncio
+import os
+import numpy as np
+
+SAMPLING_RATE = 16000
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", 10 * 1024 * 1024))
+MAX_AUDIO_SECONDS = float(os.environ.get("MAX_AUDIO_SECONDS", 120))
+
+
+class AudioIngestError(ValueError):
+    """
+    Raised when an upload cannot be decoded into usable audio.
+    """
+    status_code = 400
+
+
+class AudioTooLarge(AudioIngestError):
+    """
+    Raised when an upload exceeds MAX_UPLOAD_BYTES or MAX_AUDIO_SECONDS.
+    """
+    status_code = 413
+
+
+async def read_upload(upload, max_bytes=MAX_UPLOAD_BYTES):
+    """
+    Read an UploadFile into memory, refusing anything larger than `max_bytes`.
+    """
+    data = await upload.read(max_bytes + 1)
+    if len(data) > max_bytes:
+        raise AudioTooLarge(f"Audio upload exceeds {max_bytes} bytes")
+    if not data:
+        raise AudioIngestError("Audio upload is empty")
+    return data
+
+
+async def decode_audio(data, max_seconds=MAX_AUDIO_SECONDS):
+    """
+    Decode an audio file held in memory into a 16 kHz mono float32 waveform.
+
+    The bytes are piped through ffmpeg (stdin to stdout), so nothing touches the disk.
+    Containers that need seeking to read their index (e.g. mp4 with a trailing moov atom)
+    cannot be decoded from a pipe; browser recordings (webm, ogg, wav, fragmented mp4) can.
+
+    Raises:
+        AudioTooLarge: If the audio is longer than `max_seconds`.
+        AudioIngestError: If ffmpeg cannot decode the data or it contains no samples.
+    """
+    # Decode slightly past the limit so that over-long recordings are detected without decoding all of them
+    process = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-hide_banner", "-loglevel", "error",
+        "-i", "pipe:0",
+        "-t", str(max_seconds + 0.1),
+        "-f", "f32le", "-acodec", "pcm_f32le", "-ac", "1", "-ar", str(SAMPLING_RATE),
+        "pipe:1",
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    stdout, stderr = await process.communicate(input=data)
+    if process.returncode != 0:
+        raise AudioIngestError(f"Failed to decode audio: {stderr.decode(errors='replace').strip()[-500:]}")
+    waveform = np.frombuffer(stdout, dtype=np.float32)
+    if waveform.size == 0:
+        raise AudioIngestError("Audio upload contains no samples")
+    if waveform.size > max_seconds * SAMPLING_RATE:
+        raise AudioTooLarge(f"Audio is longer than {max_seconds:g} seconds")
+    return waveform
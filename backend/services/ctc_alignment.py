@@ -0,0 +1,185 @@
+import math
+import numpy as np
+import torch
+from services.wav2vec_alignment import build_ipa_tokenizer, clean_sentence_ipa, levenshtein_with_features, tokenize_ipa, tokenize_sentence_ipa
+
+
+class CtcForcedAligner:
+    """
+    Aligns the expected phonemes of a sentence directly against the model's CTC log-posteriors.
+
+    Viterbi over the blank-interleaved label sequence costs O(T * S) (frames times labels)
+    and gives each expected phoneme a time span and a goodness-of-pronunciation score, with
+    no word-to-span search over decoded strings.
+    """
+
+    def __init__(self, tokenizer, config, sampling_rate=16000):
+        vocab = tokenizer.get_vocab()
+        special = set(tokenizer.all_special_tokens) | {getattr(tokenizer, "word_delimiter_token", None)}
+        self.vocab = {token: i for token, i in vocab.items() if token not in special and token.strip()}
+        self.id_to_token = {i: token for token, i in vocab.items()}
+        self.blank = tokenizer.pad_token_id
+        self._tokenizer = build_ipa_tokenizer(self.vocab)
+        self.seconds_per_frame = math.prod(config.conv_stride) / sampling_rate
+
+    def labels(self, word_ipa):
+        """
+        Model vocabulary IDs of one word; symbols outside the vocabulary are skipped.
+        """
+        return [self.vocab[token] for token in self._tokenizer.findall(word_ipa) if token in self.vocab]
+
+    def label_words(self, sentence_ipa):
+        """
+        Model vocabulary IDs for each word of the sentence.
+        """
+        return [self.labels(word) for word in clean_sentence_ipa(sentence_ipa).split()]
+
+    def _viterbi(self, log_probs, labels):
+        """
+        Best CTC path for `labels`. Returns the label index (or -1 for blank) of every frame,
+        or None if the recording has too few frames for the labels.
+        """
+        T = len(log_probs)
+        ext = np.full(2 * len(labels) + 1, self.blank)
+        ext[1::2] = labels
+        S = len(ext)
+        # A skip over a blank is allowed into a label that differs from the label two back
+        can_skip = np.zeros(S, dtype=bool)
+        can_skip[3::2] = ext[3::2] != ext[1:-2:2]
+        emissions = log_probs[:, ext]
+        alpha = np.full(S, -np.inf)
+        alpha[:2] = emissions[0, :2]
+        moves = np.zeros((T, S), dtype=np.int8)
+        for t in range(1, T):
+            candidates = np.full((3, S), -np.inf)
+            candidates[0] = alpha
+            candidates[1, 1:] = alpha[:-1]
+            candidates[2, 2:] = np.where(can_skip[2:], alpha[:-2], -np.inf)
+            moves[t] = np.argmax(candidates, axis=0)
+            alpha = candidates[moves[t], np.arange(S)] + emissions[t]
+        if S > 1 and alpha[S - 2] > alpha[S - 1]:
+            state = S - 2
+        else:
+            state = S - 1
+        if alpha[state] == -np.inf:
+            return None
+        path = np.empty(T, dtype=int)
+        for t in range(T - 1, -1, -1):
+            path[t] = state
+            state -= int(moves[t, state])
+        return np.where(path % 2 == 1, path // 2, -1)
+
+    def _greedy_tokens(self, log_probs):
+        """
+        Greedy CTC decoding that keeps the first frame of every emitted phoneme.
+        """
+        ids = log_probs.argmax(axis=1)
+        starts = np.flatnonzero((ids != self.blank) & np.r_[True, ids[1:] != ids[:-1]])
+        tokens = [(int(t), self.id_to_token.get(int(ids[t]), "")) for t in starts]
+        return [(t, token) for t, token in tokens if token in self.vocab]
+
+    def _phoneme_spans(self, log_probs, labels, frame_labels, offset=0):
+        """
+        Time span and GOP confidence of every label, given the label index of each frame.
+        `offset` is the frame number of log_probs[0] within the recording.
+        """
+        # GOP: log posterior of the expected phoneme relative to the best competing token, per frame
+        expected = np.asarray(labels)[np.maximum(frame_labels, 0)]
+        frame_gop = log_probs[np.arange(len(log_probs)), expected] - log_probs.max(axis=1)
+        spans = []
+        for index, label in enumerate(labels):
+            frames = np.flatnonzero(frame_labels == index)
+            gop = float(frame_gop[frames].mean())
+            spans.append({
+                "phoneme": self.id_to_token[label],
+                "start": float((offset + frames[0]) * self.seconds_per_frame),
+                "end": float((offset + frames[-1] + 1) * self.seconds_per_frame),
+                "start_frame": int(offset + frames[0]),
+                "confidence": 100 * math.exp(gop),
+                "gop": gop,
+            })
+        return spans
+
+    @staticmethod
+    def _word_entry(ref, hyp, phonemes):
+        distance = levenshtein_with_features(ref, hyp)
+        max_length = max(len(ref), len(hyp))
+        phonemes = [{k: v for k, v in p.items() if k != "start_frame"} for p in phonemes]
+        return {
+            "IPA_word": ''.join(ref),
+            "user_phonemes": ''.join(hyp),
+            "similarity": 100 * (1 - (distance / max_length)) if max_length > 0 else 0,
+            "start": phonemes[0]["start"] if phonemes else None,
+            "end": phonemes[-1]["end"] if phonemes else None,
+            "confidence": 100 * math.exp(np.mean([p["gop"] for p in phonemes])) if phonemes else None,
+            "phonemes": phonemes,
+        }
+
+    def _best_variant(self, entry, variants, region, offset, hyp):
+        """
+        Rescore a word against its other accepted pronunciations (cleaned IPA strings), each
+        force-aligned within the frames of the word. Keeps the entry with the best similarity,
+        then the best confidence.
+        """
+        best = dict(entry, best_variant=entry["IPA_word"])
+        for variant in variants:
+            labels = self.labels(variant)
+            frame_labels = self._viterbi(region, labels) if labels and len(region) else None
+            if frame_labels is None:
+                continue
+            ref = [token for word in tokenize_ipa(variant) for token in word]
+            candidate = self._word_entry(ref, hyp, self._phoneme_spans(region, labels, frame_labels, offset))
+            if (candidate["similarity"], candidate["confidence"]) > (best["similarity"], best["confidence"] or 0):
+                best = dict(candidate, IPA_word=entry["IPA_word"], best_variant=candidate["IPA_word"])
+        return best
+
+    def align(self, logits, sentence_ipa, sentence_words, word_variants=None):
+        """
+        Score a recording against sentence_ipa from its [frames, vocab] logits.
+
+        Returns a list of word entries in the same shape as align_words_to_phonemes_dp
+        (IPA_word, user_phonemes, similarity, word) plus start/end times in seconds, a
+        confidence score and per-phoneme spans, or None if forced alignment is impossible.
+        word_variants optionally lists, per word, other accepted pronunciations as IPA strings;
+        the matching one is reported as "best_variant".
+        """
+        log_probs = torch.log_softmax(torch.as_tensor(logits, dtype=torch.float32), dim=-1).numpy()
+        words = self.label_words(sentence_ipa)
+        labels = [label for word in words for label in word]
+        if not labels or len(log_probs) == 0:
+            return None
+        frame_labels = self._viterbi(log_probs, labels)
+        if frame_labels is None:
+            return None
+        phoneme_spans = self._phoneme_spans(log_probs, labels, frame_labels)
+
+        # Every decoded token belongs to the word whose aligned span its first frame falls in
+        word_slices = []
+        position = 0
+        for word in words:
+            word_slices.append(slice(position, position + len(word)))
+            position += len(word)
+        boundaries = []
+        next_start = len(log_probs)
+        for span in reversed(word_slices):
+            if span.stop > span.start:
+                next_start = phoneme_spans[span.start]["start_frame"]
+            boundaries.append(next_start)
+        boundaries.reverse()
+        boundaries[0] = 0
+        boundaries.append(len(log_probs))
+        decoded = self._greedy_tokens(log_probs)
+
+        reference_words = tokenize_sentence_ipa(sentence_ipa)
+        alignment = []
+        for i, (ref, span) in enumerate(zip(reference_words, word_slices)):
+            region_start, region_end = boundaries[i], boundaries[i + 1]
+            hyp = [token for frame, token in decoded if region_start <= frame < region_end]
+            entry = self._word_entry(ref, hyp, phoneme_spans[span])
+            variants = word_variants[i] if word_variants and i < len(word_variants) else []
+            if variants:
+                entry = self._best_variant(entry, variants, log_probs[region_start:region_end], region_start, hyp)
+            if i < len(sentence_words):
+                entry["word"] = sentence_words[i]
+            alignment.append(entry)
+        return alignment
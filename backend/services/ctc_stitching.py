@@ -0,0 +1,77 @@
+import math
+import torch
+
+
+class LogitStitcher:
+    """
+    Runs CTC over fixed-length overlapping windows and stitches the per-frame logits back
+    into one sequence.
+
+    Window k starts at k * (window - overlap). Of each window, frames up to the middle of
+    its overlap with the next window are committed, so every committed frame saw at least
+    overlap / 2 of context on both sides. The last window ends at the end of the audio and
+    commits everything it has left. Decoding the stitched frames in one go merges CTC
+    repeats and blanks across window boundaries.
+    """
+
+    def __init__(self, config, window_seconds, overlap_seconds, sampling_rate=16000):
+        # Samples per logit frame (320 for wav2vec2); windows are aligned to whole frames
+        self.samples_per_frame = math.prod(config.conv_stride)
+        self.min_samples = config.conv_kernel[0]
+        frame = self.samples_per_frame
+        self.window = max(2, round(window_seconds * sampling_rate / frame)) * frame
+        self.overlap = min(self.window - frame, round(overlap_seconds * sampling_rate / frame) * frame)
+        self.hop = self.window - self.overlap
+        self.committed_frames = 0
+        self.next_start = 0
+        self.finished = False
+        self._chunks = []
+
+    def next_window(self, available_samples, final=False):
+        """
+        Return (start, end, is_last) of the next window to run, or None if more audio is needed.
+        With final=True the audio is complete and the remaining windows are returned.
+        """
+        if self.finished:
+            return None
+        start = self.next_start
+        if available_samples - start >= self.window:
+            end = start + self.window
+            return start, end, final and end == available_samples
+        if not final:
+            return None
+        # Last window: as long as possible and ending at the end of the audio,
+        # but never starting after the first uncommitted frame
+        start = max(0, available_samples - self.window) // self.samples_per_frame * self.samples_per_frame
+        start = min(start, self.committed_frames * self.samples_per_frame)
+        if available_samples - start < self.min_samples:
+            self.finished = True
+            return None
+        return start, available_samples, True
+
+    def add(self, start, logits, is_last):
+        """
+        Commit the frames of a window's logits ([frames, vocab]) that were not committed before.
+        """
+        first = self.committed_frames - start // self.samples_per_frame
+        if is_last:
+            keep_to = len(logits)
+            self.finished = True
+        else:
+            keep_to = (self.window - self.overlap // 2) // self.samples_per_frame
+        new_frames = logits[first:keep_to]
+        if len(new_frames):
+            self._chunks.append(new_frames)
+            self.committed_frames += len(new_frames)
+        self.next_start = start + self.hop
+        return new_frames
+
+    def logits(self):
+        """
+        All committed frames as one [frames, vocab] tensor.
+        """
+        if not self._chunks:
+            return torch.empty(0, 0)
+        if len(self._chunks) > 1:
+            self._chunks = [torch.cat(self._chunks)]
+        return self._chunks[0]
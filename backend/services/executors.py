@@ -0,0 +1,77 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# Torch parallelizes each forward pass internally and releases the GIL, so one thread
+# keeps the cores busy; a second one only helps overlap batch preparation with a pass.
+INFERENCE_THREADS = int(os.environ.get("INFERENCE_THREADS", 1))
+# Decoding, file reads and (by default) the alignment DP
+CPU_THREADS = int(os.environ.get("CPU_THREADS", 2))
+# Set to run the alignment DP in worker processes instead of CPU_THREADS
+ALIGNMENT_PROCESSES = int(os.environ.get("ALIGNMENT_PROCESSES", 0))
+
+# Pools are created on first use so that nothing is started before a worker process forks.
+_inference_pool = None
+_cpu_pool = None
+_alignment_pool = None
+
+
+def _get_inference_pool():
+    global _inference_pool
+    if _inference_pool is None:
+        _inference_pool = ThreadPoolExecutor(max_workers=INFERENCE_THREADS, thread_name_prefix="inference")
+    return _inference_pool
+
+
+def _get_cpu_pool():
+    global _cpu_pool
+    if _cpu_pool is None:
+        _cpu_pool = ThreadPoolExecutor(max_workers=CPU_THREADS, thread_name_prefix="cpu")
+    return _cpu_pool
+
+
+def _get_alignment_pool():
+    global _alignment_pool
+    if ALIGNMENT_PROCESSES <= 0:
+        return _get_cpu_pool()
+    if _alignment_pool is None:
+        _alignment_pool = ProcessPoolExecutor(max_workers=ALIGNMENT_PROCESSES)
+    return _alignment_pool
+
+
+async def _run(pool, fn, *args, **kwargs):
+    return await asyncio.get_running_loop().run_in_executor(pool, functools.partial(fn, *args, **kwargs))
+
+
+async def run_inference(fn, *args, **kwargs):
+    """
+    Run a model forward pass off the event loop.
+    """
+    return await _run(_get_inference_pool(), fn, *args, **kwargs)
+
+
+async def run_cpu_bound(fn, *args, **kwargs):
+    """
+    Run blocking CPU or file work off the event loop.
+    """
+    return await _run(_get_cpu_pool(), fn, *args, **kwargs)
+
+
+async def run_alignment(fn, *args, **kwargs):
+    """
+    Run the alignment DP off the event loop. With ALIGNMENT_PROCESSES set, `fn` and its
+    arguments must be picklable.
+    """
+    return await _run(_get_alignment_pool(), fn, *args, **kwargs)
+
+
+def shutdown():
+    """
+    Stop all pools; called when the application shuts down.
+    """
+    global _inference_pool, _cpu_pool, _alignment_pool
+    for pool in (_inference_pool, _cpu_pool, _alignment_pool):
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+    _inference_pool = _cpu_pool = _alignment_pool = None
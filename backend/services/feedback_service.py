@@ -0,0 +1,145 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+import re
+import time
+from services.llm_client import llm_teacher
+from services.result_cache import result_cache
+from services.tracing import get_logger, log_event
+
+# Same rules the LLMTeacher prompt spells out
+MISPRONOUNCED_BELOW = float(os.environ.get("MISPRONOUNCED_BELOW", 85))
+MAX_FEEDBACK_WORDS = int(os.environ.get("MAX_FEEDBACK_WORDS", 3))
+# Also ask LLMTeacher for feedback in the background, unless the request says otherwise
+LLM_ENRICHMENT = os.environ.get("LLM_ENRICHMENT", "0") == "1"
+# An enrichment still pending after this long is reported as failed (its worker probably died)
+LLM_ENRICHMENT_MAX_SECONDS = float(os.environ.get("LLM_ENRICHMENT_MAX_SECONDS", 120))
+# How often wait_enrichment checks on an enrichment running in another worker
+_ENRICHMENT_POLL_SECONDS = 0.5
+
+_WORD = re.compile(r"\b[\w']+\b")
+
+# analysis_id -> LLM enrichment task running in this worker. The state that other workers
+# see (pending, ready, failed) lives in result_cache, which needs RESULT_CACHE_PATH to be shared.
+_enrichment_tasks = {}
+logger = get_logger("feedback")
+
+
+def local_feedback(wav2vec_result):
+    """
+    Score a pronunciation from its word alignments without an LLM.
+
+    Words below MISPRONOUNCED_BELOW similarity are mispronounced; the worst MAX_FEEDBACK_WORDS
+    of them are highlighted in the sentence and listed in try_saying, and each one costs
+    10 points. Returns {"score", "highlighted_sentence", "try_saying"}.
+    """
+    sentence = wav2vec_result["sentence"]
+    alignments = wav2vec_result["word_alignments"]
+    if any("error" in entry for entry in alignments):
+        # Nothing could be aligned, so no word can be said to be right
+        return {"score": 0, "highlighted_sentence": sentence, "try_saying": []}
+
+    mispronounced = [
+        (entry["similarity"], i) for i, entry in enumerate(alignments)
+        if entry["similarity"] < MISPRONOUNCED_BELOW
+    ]
+    worst = sorted(i for _, i in sorted(mispronounced)[:MAX_FEEDBACK_WORDS])
+    if not worst:
+        return {"score": 100, "highlighted_sentence": sentence, "try_saying": ["PERFECT!"]}
+
+    # Word i of the alignment is the i-th word match in the sentence (see extract_sentence_words)
+    highlighted = set(worst)
+    positions = itertools.count()
+    highlighted_sentence = _WORD.sub(
+        lambda m: f"<font color='red'>{m.group(0)}</font>" if next(positions) in highlighted else m.group(0),
+        sentence,
+    )
+    try_saying = [
+        {
+            "en_word": alignments[i].get("word", ""),
+            "wrong_word": alignments[i]["user_phonemes"],
+            "right_word": alignments[i]["IPA_word"],
+        }
+        for i in worst
+    ]
+    return {
+        "score": max(0, 100 - len(worst) * 10),
+        "highlighted_sentence": highlighted_sentence,
+        "try_saying": try_saying,
+    }
+
+
+def as_chat_response(feedback):
+    """
+    Wrap feedback in the chat-completion shape the frontend reads (choices[0].message.content).
+    """
+    return {"choices": [{"message": {"content": json.dumps(feedback)}}]}
+
+
+def _enrichment_key(analysis_id):
+    return f"{analysis_id}:llm"
+
+
+def _enrichment_error_key(analysis_id):
+    return f"{analysis_id}:llm-error"
+
+
+def _enrichment_started_key(analysis_id):
+    return f"{analysis_id}:llm-started"
+
+
+async def _enrich(analysis_id, wav2vec_result):
+    try:
+        llm_feedback = await llm_teacher.post_json("/analyze-pronunciation", {"alignment_results": wav2vec_result})
+        await result_cache.put(_enrichment_key(analysis_id), llm_feedback)
+    except Exception as e:
+        log_event(logger, logging.WARNING, "llm_enrichment_failed", analysis_id=analysis_id, error=str(e))
+        await result_cache.put(_enrichment_error_key(analysis_id), str(e))
+    finally:
+        _enrichment_tasks.pop(analysis_id, None)
+
+
+async def start_enrichment(analysis_id, wav2vec_result):
+    """
+    Ask LLMTeacher for feedback in the background; fetch it later with get_enrichment.
+    """
+    if analysis_id not in _enrichment_tasks:
+        # Recorded before the task starts, so that a poll on any worker sees it as pending
+        await result_cache.put(_enrichment_started_key(analysis_id), time.time())
+        _enrichment_tasks[analysis_id] = asyncio.create_task(_enrich(analysis_id, wav2vec_result))
+
+
+async def get_enrichment(analysis_id):
+    """
+    Returns ("ready", llm_feedback), ("pending", None), ("failed", error) or ("unknown", None).
+    """
+    llm_feedback = await result_cache.get(_enrichment_key(analysis_id))
+    if llm_feedback is not None:
+        return "ready", llm_feedback
+    if analysis_id in _enrichment_tasks:
+        return "pending", None
+    error = await result_cache.get(_enrichment_error_key(analysis_id))
+    if error is not None:
+        return "failed", error
+    started = await result_cache.get(_enrichment_started_key(analysis_id))
+    if started is not None:
+        if time.time() - started < LLM_ENRICHMENT_MAX_SECONDS:
+            return "pending", None
+        return "failed", "LLM feedback did not finish in time"
+    return "unknown", None
+
+
+async def wait_enrichment(analysis_id):
+    """
+    Wait for an enrichment to finish, here or in another worker, then return get_enrichment(analysis_id).
+    """
+    task = _enrichment_tasks.get(analysis_id)
+    if task is not None:
+        await asyncio.shield(task)
+    state, value = await get_enrichment(analysis_id)
+    while state == "pending":
+        await asyncio.sleep(_ENRICHMENT_POLL_SECONDS)
+        state, value = await get_enrichment(analysis_id)
+    return state, value
@@ -0,0 +1,111 @@
+import os
+import time
+import numpy as np
+import torch
+from transformers import Wav2Vec2Config, Wav2Vec2ForCTC, Wav2Vec2Processor
+
+MODEL_NAME = "facebook/wav2vec2-lv-60-espeak-cv-ft"
+MODEL_CACHE = os.environ.get("TRANSFORMERS_CACHE", None)
+# torch: float32 eager PyTorch, torch-int8: dynamically quantized Linear layers, onnx: ONNX Runtime
+INFERENCE_ENGINE = os.environ.get("INFERENCE_ENGINE", "torch")
+ONNX_MODEL_PATH = os.environ.get(
+    "ONNX_MODEL_PATH",
+    os.path.join(MODEL_CACHE or "model_cache", "wav2vec2-lv-60-espeak-cv-ft.onnx"),
+)
+ENGINES = ("torch", "torch-int8", "onnx")
+
+
+def frame_counts(config, input_lengths):
+    """
+    Number of logit frames the convolutional feature encoder produces for each input length.
+    """
+    lengths = torch.as_tensor(input_lengths)
+    for kernel, stride in zip(config.conv_kernel, config.conv_stride):
+        lengths = torch.div(lengths - kernel, stride, rounding_mode="floor") + 1
+    return lengths.tolist()
+
+
+class TorchEngine:
+    """
+    Runs a Wav2Vec2ForCTC module (float32 or quantized) with PyTorch.
+    """
+
+    def __init__(self, model, device):
+        self.model = model
+        self.device = device
+        self.config = model.config
+
+    def logits(self, input_values, attention_mask):
+        with torch.no_grad():
+            return self.model(
+                input_values.to(self.device),
+                attention_mask=attention_mask.to(self.device),
+            ).logits.cpu()
+
+
+class OnnxEngine:
+    """
+    Runs an exported Wav2Vec2ForCTC graph (see export_onnx.py) with ONNX Runtime on the CPU.
+    """
+
+    def __init__(self, path, config):
+        try:
+            import onnxruntime
+        except ImportError as e:
+            raise RuntimeError("INFERENCE_ENGINE=onnx requires the onnxruntime package") from e
+        if not os.path.exists(path):
+            raise RuntimeError(f"ONNX model not found at {path}; run export_onnx.py first")
+        options = onnxruntime.SessionOptions()
+        # Input lengths vary per request, so a memory arena mostly holds on to peak-sized buffers
+        options.enable_cpu_mem_arena = False
+        self.session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.config = config
+
+    def logits(self, input_values, attention_mask):
+        (logits,) = self.session.run(["logits"], {
+            "input_values": input_values.numpy(),
+            "attention_mask": attention_mask.numpy().astype(np.int64),
+        })
+        return torch.from_numpy(logits)
+
+
+def load_engine(name=INFERENCE_ENGINE, model_name=MODEL_NAME, cache_dir=MODEL_CACHE, onnx_path=ONNX_MODEL_PATH, timings=None):
+    """
+    Load the processor and the selected inference engine.
+    If `timings` is a dict, the seconds spent in each loading step are recorded in it.
+
+    Returns:
+        tuple: (Wav2Vec2Processor, engine with .logits(input_values, attention_mask) and .config)
+    """
+    if name not in ENGINES:
+        raise ValueError(f"Unknown INFERENCE_ENGINE {name!r}; expected one of {', '.join(ENGINES)}")
+    timings = {} if timings is None else timings
+    start = time.perf_counter()
+
+    def lap(step):
+        nonlocal start
+        now = time.perf_counter()
+        timings[step] = now - start
+        start = now
+
+    processor = Wav2Vec2Processor.from_pretrained(model_name, cache_dir=cache_dir)
+    lap("processor_load")
+    if name == "onnx":
+        config = Wav2Vec2Config.from_pretrained(model_name, cache_dir=cache_dir)
+        engine = OnnxEngine(onnx_path, config)
+        lap("weights_load")
+        return processor, engine
+
+    model = Wav2Vec2ForCTC.from_pretrained(model_name, cache_dir=cache_dir)
+    model.eval()
+    lap("weights_load")
+    if name == "torch-int8":
+        # Dynamic quantization only has CPU kernels; weights of the replaced Linear layers are freed
+        device = torch.device("cpu")
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+        lap("quantize")
+    else:
+        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        model.to(device)
+        lap("device_move")
+    return processor, TorchEngine(model, device)
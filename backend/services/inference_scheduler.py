@@ -0,0 +1,143 @@
+import asyncio
+import os
+import numpy as np
+import torch
+from services.audio_ingest import SAMPLING_RATE
+from services.executors import run_inference
+from services.inference_engine import frame_counts
+
+INFERENCE_MAX_BATCH_SIZE = int(os.environ.get("INFERENCE_MAX_BATCH_SIZE", 8))
+INFERENCE_MAX_WAIT_MS = float(os.environ.get("INFERENCE_MAX_WAIT_MS", 10))
+INFERENCE_QUEUE_DEPTH = int(os.environ.get("INFERENCE_QUEUE_DEPTH", 64))
+
+
+class InferenceQueueFull(RuntimeError):
+    """
+    Raised when more requests are waiting for the model than the queue allows.
+    """
+
+
+class InferenceScheduler:
+    """
+    Micro-batches concurrent transcription requests into single Wav2Vec2 forward passes.
+
+    Requests wait up to `max_wait_ms` for company (or until `max_batch_size` is reached),
+    are padded together with an attention mask, and each caller gets back its own
+    transcription and the logits for its unpadded frames.
+    """
+
+    def __init__(self, processor, engine,
+                 max_batch_size=INFERENCE_MAX_BATCH_SIZE,
+                 max_wait_ms=INFERENCE_MAX_WAIT_MS,
+                 queue_depth=INFERENCE_QUEUE_DEPTH):
+        self.processor = processor
+        self.engine = engine
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue_depth = queue_depth
+        self._queue = None
+        self._worker = None
+        self._batches = 0
+        self._requests = 0
+        self._full_batches = 0
+        self._rejected = 0
+
+    def _ensure_started(self):
+        # The queue and worker belong to the running event loop, so they are created on first use.
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue(maxsize=self.queue_depth)
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def transcribe(self, waveform):
+        """
+        Queue a 16 kHz mono waveform for inference.
+
+        Returns:
+            tuple: (transcription string, logits tensor of shape [frames, vocab])
+
+        Raises:
+            InferenceQueueFull: If `queue_depth` requests are already waiting.
+        """
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((np.asarray(waveform, dtype=np.float32), future))
+        except asyncio.QueueFull:
+            self._rejected += 1
+            raise InferenceQueueFull(f"Inference queue is full ({self.queue_depth} requests waiting)")
+        return await future
+
+    async def _collect_batch(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        # Callers that gave up while waiting do not need a slot in the forward pass
+        return [(waveform, future) for waveform, future in batch if not future.cancelled()]
+
+    async def _run(self):
+        while True:
+            batch = await self._collect_batch()
+            if not batch:
+                continue
+            try:
+                results = await run_inference(self._forward, [waveform for waveform, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self._batches += 1
+            self._requests += len(batch)
+            if len(batch) == self.max_batch_size:
+                self._full_batches += 1
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def _forward(self, waveforms):
+        inputs = self.processor(
+            waveforms,
+            sampling_rate=SAMPLING_RATE,
+            return_tensors="pt",
+            padding=True,
+            return_attention_mask=True,
+        )
+        logits = self.engine.logits(inputs.input_values, inputs.attention_mask)
+        # Number of logit frames that belong to each (unpadded) waveform
+        counts = frame_counts(self.engine.config, inputs.attention_mask.sum(-1))
+        predicted_ids = torch.argmax(logits, dim=-1)
+        transcriptions = self.processor.batch_decode(
+            [predicted_ids[b, :n] for b, n in enumerate(counts)]
+        )
+        # Copies, so that a request holding on to its logits (e.g. in the logits cache)
+        # does not keep the whole padded batch alive
+        return [
+            (transcriptions[b], logits[b, :n].clone())
+            for b, n in enumerate(counts)
+        ]
+
+    def stats(self):
+        """
+        Batch fill statistics since startup.
+        """
+        mean_batch_size = self._requests / self._batches if self._batches else 0.0
+        return {
+            "batches": self._batches,
+            "requests": self._requests,
+            "full_batches": self._full_batches,
+            "rejected": self._rejected,
+            "mean_batch_size": mean_batch_size,
+            "fill_rate": mean_batch_size / self.max_batch_size,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queue_depth": self.queue_depth,
+        }
@@ -0,0 +1,77 @@
+import asyncio
+import os
+import random
+import httpx
+
+LLMTEACHER_URL = os.environ.get("LLMTEACHER_URL", "http://llmteacher:5000")
+LLM_CONNECT_TIMEOUT = float(os.environ.get("LLM_CONNECT_TIMEOUT", 3))
+LLM_READ_TIMEOUT = float(os.environ.get("LLM_READ_TIMEOUT", 30))
+# Requests to LLMTeacher in flight at once per worker; the rest wait for a slot
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", 8))
+LLM_MAX_KEEPALIVE = int(os.environ.get("LLM_MAX_KEEPALIVE", 8))
+LLM_RETRIES = int(os.environ.get("LLM_RETRIES", 2))
+LLM_RETRY_BACKOFF = float(os.environ.get("LLM_RETRY_BACKOFF", 0.25))
+
+# Failures where the request cannot have been processed, or the service asked us to come back later.
+# Read timeouts are not retried: the LLM may still be working on the first attempt.
+_RETRY_EXCEPTIONS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout, httpx.RemoteProtocolError)
+_RETRY_STATUSES = {502, 503, 504}
+
+
+class LLMTeacherClient:
+    """
+    Shared async HTTP client for backend-to-LLMTeacher calls. One pooled keep-alive client per
+    worker is opened in the app lifespan; a semaphore caps concurrent calls so that a slow LLM
+    cannot pile up unbounded requests.
+    """
+
+    def __init__(self, base_url=LLMTEACHER_URL, max_concurrency=LLM_MAX_CONCURRENCY, retries=LLM_RETRIES):
+        self.base_url = base_url
+        self.retries = retries
+        self.max_concurrency = max_concurrency
+        self._client = None
+        self._semaphore = None
+
+    async def start(self):
+        if self._client is not None:
+            return
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=LLM_MAX_KEEPALIVE),
+        )
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def post(self, path, payload):
+        """
+        POST a JSON payload and return the response. Connection failures and 502/503/504
+        answers are retried with jittered exponential backoff; other errors raise.
+        """
+        if self._client is None:
+            await self.start()
+        async with self._semaphore:
+            for attempt in range(self.retries + 1):
+                last_attempt = attempt == self.retries
+                try:
+                    response = await self._client.post(path, json=payload)
+                    if response.status_code not in _RETRY_STATUSES or last_attempt:
+                        response.raise_for_status()
+                        return response
+                except _RETRY_EXCEPTIONS:
+                    if last_attempt:
+                        raise
+                # Full jitter: spread retries from many requests instead of retrying in lockstep
+                await asyncio.sleep(random.uniform(0, LLM_RETRY_BACKOFF * 2 ** attempt))
+
+    async def post_json(self, path, payload):
+        """
+        Like post, returning the decoded JSON response.
+        """
+        return (await self.post(path, payload)).json()
+
+llm_teacher = LLMTeacherClient()
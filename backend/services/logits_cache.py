@@ -0,0 +1,80 @@
+import hashlib
+import os
+import time
+from collections import OrderedDict
+
+LOGITS_CACHE_SIZE = int(os.environ.get("LOGITS_CACHE_SIZE", 32))
+LOGITS_CACHE_TTL_SECONDS = float(os.environ.get("LOGITS_CACHE_TTL_SECONDS", 300))
+LOGITS_CACHE_MAX_BYTES = int(os.environ.get("LOGITS_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+
+class UnknownAudioId(LookupError):
+    """
+    Raised when an audio_id is not (or no longer) in the cache.
+    """
+
+
+def audio_id(data):
+    """
+    Identifier of an upload: the SHA-256 of its bytes.
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+class LogitsCache:
+    """
+    Short-lived cache of (transcription, logits, speech) per uploaded recording, so that
+    re-scoring the same recording (for example against other accepted pronunciations) does
+    not run the model again. Entries expire after `ttl` seconds; the least recently used
+    entries are dropped when the cache holds more than `max_entries` or more than
+    `max_bytes` of logits.
+    """
+
+    def __init__(self, max_entries=LOGITS_CACHE_SIZE, ttl=LOGITS_CACHE_TTL_SECONDS, max_bytes=LOGITS_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def _expire(self, now):
+        while self._entries:
+            key, (expires, _, _) = next(iter(self._entries.items()))
+            if expires > now:
+                break
+            self._remove(key)
+
+    def get(self, key):
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= now:
+            return None
+        # Reading an entry keeps it alive for another ttl
+        self._entries[key] = (now + self.ttl, entry[1], entry[2])
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key, value):
+        # The logits are charged by their own size; the scheduler hands out copies,
+        # not views of the padded batch
+        size = value[1].nbytes
+        if self.max_entries <= 0 or size > self.max_bytes:
+            return
+        now = time.monotonic()
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (now + self.ttl, value, size)
+        self._bytes += size
+        self._expire(now)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+
+    def __len__(self):
+        return len(self._entries)
+
+
+logits_cache = LogitsCache()
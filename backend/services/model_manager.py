@@ -0,0 +1,104 @@
+import asyncio
+import logging
+import os
+import time
+import numpy as np
+from services.audio_ingest import SAMPLING_RATE
+from services.inference_engine import INFERENCE_ENGINE, MODEL_CACHE, load_engine
+from services.inference_scheduler import InferenceScheduler
+from services.tracing import get_logger, log_event
+
+# Length of the synthetic clip pushed through the model before reporting ready; 0 skips warmup
+WARMUP_SECONDS = float(os.environ.get("WARMUP_SECONDS", 2))
+WARMUP_PASSES = int(os.environ.get("WARMUP_PASSES", 1))
+
+logger = get_logger("model_manager")
+
+
+class ModelNotReady(RuntimeError):
+    """
+    Raised when a request needs the model before it has loaded and warmed up.
+    """
+
+
+class ModelManager:
+    """
+    Owns the processor, inference engine and scheduler, and tracks their lifecycle:
+    not_loaded -> loading -> warming_up -> ready (or failed).
+    """
+
+    def __init__(self):
+        self.processor = None
+        self.engine = None
+        self.scheduler = None
+        self.state = "not_loaded"
+        self.error = None
+        self.timings = {}
+
+    def load(self):
+        """
+        Load the processor and engine (blocking). Safe to call before the event loop exists.
+        """
+        if self.engine is not None:
+            return
+        self.state = "loading"
+        log_event(logger, logging.INFO, "model_loading", engine=INFERENCE_ENGINE, cache=MODEL_CACHE)
+        self.processor, self.engine = load_engine(timings=self.timings)
+        self.scheduler = InferenceScheduler(self.processor, self.engine)
+
+    async def warmup(self):
+        """
+        Run forward passes on synthetic audio so the first real request does not pay for
+        lazy allocations and a cold model.
+        """
+        self.state = "warming_up"
+        if WARMUP_SECONDS <= 0:
+            return
+        # Low-level noise rather than silence so that normalization does not divide by zero
+        waveform = np.random.default_rng(0).normal(0, 0.01, int(WARMUP_SECONDS * SAMPLING_RATE)).astype(np.float32)
+        log_event(logger, logging.INFO, "model_warmup", seconds=WARMUP_SECONDS, passes=WARMUP_PASSES)
+        start = time.perf_counter()
+        for _ in range(WARMUP_PASSES):
+            await self.scheduler.transcribe(waveform)
+        self.timings["warmup"] = time.perf_counter() - start
+
+    async def start(self):
+        """
+        Load (off the event loop) and warm up the model; called from the app lifespan.
+        Failures are recorded in the status rather than raised.
+        """
+        start = time.perf_counter()
+        try:
+            await asyncio.to_thread(self.load)
+            await self.warmup()
+        except Exception as e:
+            self.state = "failed"
+            self.error = str(e)
+            log_event(logger, logging.ERROR, "model_startup_failed", error=str(e))
+            return
+        self.timings["total"] = time.perf_counter() - start
+        self.state = "ready"
+        log_event(logger, logging.INFO, "model_ready", timings={step: round(t, 3) for step, t in self.timings.items()})
+
+    @property
+    def ready(self):
+        return self.state == "ready"
+
+    def require_scheduler(self):
+        """
+        Return the scheduler, or raise ModelNotReady while the model is still starting.
+        """
+        if not self.ready:
+            raise ModelNotReady(f"Model is not ready (state: {self.state})")
+        return self.scheduler
+
+    def status(self):
+        return {
+            "state": self.state,
+            "engine": INFERENCE_ENGINE,
+            "error": self.error,
+            "timings": self.timings,
+        }
+
+
+model_manager = ModelManager()
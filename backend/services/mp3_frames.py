@@ -0,0 +1,60 @@
+import bisect
+
+# MPEG Layer III tables; index 0 of each is the MPEG-1 variant, index 1 MPEG-2 and 2.5
+_BITRATES_KBPS = (
+    (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+)
+# Keyed by the header's version bits: 3 = MPEG-1, 2 = MPEG-2, 0 = MPEG-2.5
+_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+
+def _skip_id3(data):
+    if data[:3] != b"ID3" or len(data) < 10:
+        return 0
+    size = 0
+    for byte in data[6:10]:
+        size = (size << 7) | (byte & 0x7F)
+    return 10 + size
+
+
+def frame_index(data):
+    """
+    Byte offset and start time (seconds) of every Layer III frame in `data`, plus the total duration.
+    Returns (offsets, starts, duration); offsets has one extra entry for the end of the last frame.
+    """
+    offsets, starts = [], []
+    pos = _skip_id3(data)
+    time = 0.0
+    while pos + 4 <= len(data):
+        b1, b2 = data[pos + 1], data[pos + 2]
+        version = (b1 >> 3) & 3
+        if data[pos] != 0xFF or (b1 & 0xE0) != 0xE0 or version == 1 or (b1 >> 1) & 3 != 1:
+            if offsets:
+                # Trailing tag or junk after the last frame
+                break
+            raise ValueError("Not an MPEG Layer III stream")
+        bitrate_index, rate_index = b2 >> 4, (b2 >> 2) & 3
+        if bitrate_index in (0, 15) or rate_index == 3:
+            raise ValueError(f"Unsupported MP3 frame header at byte {pos}")
+        mpeg1 = version == 3
+        bitrate = _BITRATES_KBPS[0 if mpeg1 else 1][bitrate_index] * 1000
+        sample_rate = _SAMPLE_RATES[version][rate_index]
+        samples = 1152 if mpeg1 else 576
+        length = samples // 8 * bitrate // sample_rate + ((b2 >> 1) & 1)
+        offsets.append(pos)
+        starts.append(time)
+        pos += length
+        time += samples / sample_rate
+    offsets.append(min(pos, len(data)))
+    return offsets, starts, time
+
+
+def slice_mp3(data, start, end):
+    """
+    The frames of `data` that overlap [start, end) seconds, as a playable MP3.
+    """
+    offsets, starts, _ = frame_index(data)
+    first = max(0, bisect.bisect_right(starts, start) - 1)
+    last = max(first + 1, bisect.bisect_left(starts, end))
+    return data[offsets[first]:offsets[last]]
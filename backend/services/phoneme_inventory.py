@@ -0,0 +1,181 @@
+import numpy as np
+
+
+# Enhanced IPA_FEATURES dictionary with expanded vocabulary
+IPA_FEATURES = {
+    # Vowels
+    'ɪ': [1, 0, 1, 0, 0],  # Near-close near-front unrounded vowel
+    'i': [1, 0, 0, 0, 0],  # Close front unrounded vowel
+    'iː': [1, 0, 0, 0, 1], # Long close front unrounded vowel
+    'ɛ': [1, 2, 0, 0, 0],  # Open-mid front unrounded vowel
+    'e': [1, 1, 0, 0, 0],  # Close-mid front unrounded vowel
+    'æ': [1, 3, 0, 0, 0],  # Near-open front unrounded vowel
+    'ə': [1, 2, 1, 0, 0],  # Mid central vowel (schwa)
+    'ɚ': [1, 2, 1, 0, 2],  # R-colored schwa (same as ə but rhoticized)
+    'ɐ': [1, 3, 1, 0, 0],  # Near-open central vowel
+    'ʌ': [1, 2, 2, 0, 0],  # Open-mid back unrounded vowel
+    'ɑ': [1, 4, 2, 0, 0],  # Open back unrounded vowel
+    'ɑː': [1, 4, 2, 0, 1], # Long open back unrounded vowel
+    'ɒ': [1, 4, 2, 1, 0],  # Open back rounded vowel
+    'ɔ': [1, 3, 2, 1, 0],  # Open-mid back rounded vowel
+    'ɔː': [1, 3, 2, 1, 1], # Long open-mid back rounded vowel
+    'ʊ': [1, 0, 3, 1, 0],  # Near-close near-back rounded vowel
+    'u': [1, 0, 2, 1, 0],  # Close back rounded vowel
+    'uː': [1, 0, 2, 1, 1], # Long close back rounded vowel
+    'ᵻ': [1, 0, 1, 0, 0],  # Centralized i
+    'o': [1, 2, 2, 1, 0],  # Close-mid back rounded vowel
+    'a': [1, 4, 0, 0, 0],  # Open front unrounded vowel
+    'y': [1, 0, 0, 1, 0],  # Close front rounded vowel
+    'ø': [1, 1, 0, 1, 0],  # Close-mid front rounded vowel
+    'œ': [1, 2, 0, 1, 0],  # Open-mid front rounded vowel
+    'ɯ': [1, 0, 2, 0, 0],  # Close back unrounded vowel
+    # Diphthongs
+    'eɪ': [1, 1, 0, 0, 3],  # Diphthong type 1
+    'aɪ': [1, 4, 0, 0, 3],  # Diphthong type 2
+    'ɔɪ': [1, 3, 2, 1, 3],  # Diphthong type 3
+    'aʊ': [1, 3, 2, 1, 3],  # Diphthong type 4 - adjusted height to be closer to oʊ
+    'oʊ': [1, 2, 2, 1, 3],  # Diphthong type 5 - adjusted height to be closer to aʊ
+    'əʊ': [1, 2, 1, 0, 3],  # Diphthong type 6
+    # Rhoticized vowels - these are equivalent to vowel + r
+    'ɑːɹ': [1, 4, 2, 0, 2], # Rhoticized long open back unrounded vowel
+    'ɔːɹ': [1, 3, 2, 1, 2], # Rhoticized long open-mid back rounded vowel
+    'ɝ': [1, 2, 1, 0, 2],   # Rhoticized mid central vowel (same as ɚ)
+    'ər': [1, 2, 1, 0, 2],  # Explicit schwa + r (same as ɚ)
+    # Consonants
+    'p': [0, 0, 0, 0, 0],
+    'b': [0, 0, 0, 1, 0],
+    't': [0, 3, 0, 0, 0],
+    'd': [0, 3, 0, 1, 0],
+    'k': [0, 6, 0, 0, 0],
+    'ɡ': [0, 6, 0, 1, 0],
+    'g': [0, 6, 0, 1, 0],
+    'f': [0, 1, 2, 0, 0],
+    'v': [0, 1, 2, 1, 0],
+    'θ': [0, 2, 2, 0, 0],
+    'ð': [0, 2, 2, 1, 0],
+    's': [0, 3, 2, 0, 0],
+    'z': [0, 3, 2, 1, 0],
+    'ʃ': [0, 4, 2, 0, 0],
+    'ʒ': [0, 4, 2, 1, 0],
+    'h': [0, 7, 2, 0, 0],
+    'm': [0, 0, 1, 1, 0],
+    'n': [0, 3, 1, 1, 0],
+    'ŋ': [0, 6, 1, 1, 0],
+    'l': [0, 3, 4, 1, 0],
+    'ɹ': [0, 3, 3, 1, 0],
+    'r': [0, 3, 3, 1, 0],
+    'j': [0, 5, 3, 1, 0],
+    'w': [0, 0, 3, 1, 0],
+    # Affricates
+    'tʃ': [0, 4, 0, 0, 0],
+    'dʒ': [0, 4, 0, 1, 0],
+    # Special cases - syllabic consonants and compounds
+    'əl': [1, 2, 1, 0, 0],
+    'ən': [1, 2, 1, 0, 0],
+}
+
+# Phoneme equivalence mappings - these are considered the same sound
+PHONEME_EQUIVALENTS = {
+    'ɚ': ['ər', 'ɝ'],      # R-colored schwa variants
+    'ɝ': ['ɚ', 'ər'],      # R-colored schwa variants
+    'ər': ['ɚ', 'ɝ'],      # R-colored schwa variants
+    'r': ['ɹ'],            # R variants
+    'ɹ': ['r'],            # R variants
+    'g': ['ɡ'],            # G variants
+    'ɡ': ['g'],            # G variants
+    'i': ['iː'],           # Length variants (minor difference)
+    'iː': ['i'],
+    'u': ['uː'],
+    'uː': ['u'],
+    'ɑ': ['ɑː'],
+    'ɑː': ['ɑ'],
+    'ɔ': ['ɔː'],
+    'ɔː': ['ɔ'],
+}
+
+def phonetic_distance(a, b):
+    """
+    Calculate phonetic distance between two IPA symbols based on features.
+    Returns a value between 0 (identical) and 1 (maximally different)
+    """
+    if a == b:
+        return 0.0
+    
+    # Check if phonemes are equivalent (e.g., ɚ == ər)
+    if a in PHONEME_EQUIVALENTS and b in PHONEME_EQUIVALENTS.get(a, []):
+        return 0.0
+    if b in PHONEME_EQUIVALENTS and a in PHONEME_EQUIVALENTS.get(b, []):
+        return 0.0
+    
+    # Special case: Compare compound phonemes like "ər" to single phonemes like "ɚ"
+    # ər (2 chars) vs ɚ (1 char) - these are the same sound
+    if (a == 'ə' and b == 'ɚ') or (a == 'ɚ' and b == 'ə'):
+        return 0.15  # Very small penalty - nearly the same
+    
+    if a not in IPA_FEATURES or b not in IPA_FEATURES:
+        return 1.0
+    features_a = IPA_FEATURES[a]
+    features_b = IPA_FEATURES[b]
+    if features_a[0] != features_b[0]:
+        return 0.8
+    weights = [0.0, 0.3, 0.3, 0.2, 0.2]
+    total_weight = sum(weights[1:])
+    weighted_diff = 0
+    for i in range(1, len(features_a)):
+        if features_a[i] != features_b[i]:
+            feature_range = 8 if i == 1 and features_a[0] == 0 else \
+                            5 if i == 1 and features_a[0] == 1 else \
+                            5 if i == 2 and features_a[0] == 0 else \
+                            3 if i == 2 and features_a[0] == 1 else 2
+            diff = abs(features_a[i] - features_b[i]) / feature_range
+            weighted_diff += weights[i] * diff
+    distance = weighted_diff / total_weight
+    if features_a[0] == 0 and features_b[0] == 0 and features_a[1] == features_b[1] and features_a[2] == features_b[2]:
+        if features_a[3] != features_b[3]:
+            distance *= 0.7
+    if features_a[0] == 1 and features_b[0] == 1:
+        height_diff = abs(features_a[1] - features_b[1])
+        if height_diff == 1:
+            distance *= 0.8
+    return min(1.0, distance)
+
+def _build_distance_table(symbols):
+    """
+    Evaluate phonetic_distance for every pair of symbols once.
+    """
+    table = np.empty((len(symbols), len(symbols)), dtype=float)
+    for i, a in enumerate(symbols):
+        for j, b in enumerate(symbols):
+            table[i, j] = phonetic_distance(a, b)
+    return table
+
+# Every symbol with a feature vector gets a fixed integer ID at import time.
+PHONEME_IDS = {symbol: i for i, symbol in enumerate(IPA_FEATURES)}
+_distance_table = _build_distance_table(list(IPA_FEATURES))
+
+def encode(phonemes, unknown=None):
+    """
+    Convert a sequence of IPA symbols into an array of phoneme IDs.
+    Symbols outside the inventory are numbered from len(PHONEME_IDS) up in the `unknown` dict
+    (symbol -> ID), which is local to the caller: pass the same dict to every sequence that
+    will be compared, so that equal unknown symbols get equal IDs.
+    """
+    if unknown is None:
+        unknown = {}
+    def symbol_id(symbol):
+        sid = PHONEME_IDS.get(symbol)
+        return sid if sid is not None else unknown.setdefault(symbol, len(PHONEME_IDS) + len(unknown))
+    return np.fromiter((symbol_id(p) for p in phonemes), dtype=np.intp, count=len(phonemes))
+
+def distance_matrix(a, b):
+    """
+    Distances between every a[i] and b[j], for ID arrays from encode.
+    Unknown symbols are 0 away from themselves and 1 away from everything else,
+    which is exactly what phonetic_distance returns for them.
+    """
+    n = len(PHONEME_IDS)
+    costs = _distance_table[np.ix_(np.minimum(a, n-1), np.minimum(b, n-1))]
+    if (len(a) and a.max() >= n) or (len(b) and b.max() >= n):
+        unknown = (a[:, None] >= n) | (b[None, :] >= n)
+        costs[unknown] = np.where(a[:, None] == b[None, :], 0.0, 1.0)[unknown]
+    return costs
@@ -0,0 +1,201 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from services.executors import run_cpu_bound
+from services.single_flight import SingleFlight
+
+# Serialized size of the results kept in memory
+RESULT_CACHE_MAX_BYTES = int(os.environ.get("RESULT_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+RESULT_CACHE_TTL_SECONDS = float(os.environ.get("RESULT_CACHE_TTL_SECONDS", 24 * 60 * 60))
+# SQLite file for a second tier that survives restarts and is shared by workers; empty disables it
+RESULT_CACHE_PATH = os.environ.get("RESULT_CACHE_PATH", "")
+RESULT_CACHE_DISK_MAX_ENTRIES = int(os.environ.get("RESULT_CACHE_DISK_MAX_ENTRIES", 10000))
+
+
+def cache_key(*parts):
+    """
+    Content address of a request: the SHA-256 of its parts (None and strings alike).
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        encoded = json.dumps(part).encode()
+        digest.update(len(encoded).to_bytes(8, "little"))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+
+class _DiskTier:
+    """
+    SQLite table of serialized results with an expiry time, trimmed to the least recently
+    read `max_entries` on every write.
+    """
+
+    def __init__(self, path, max_entries):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._db = None
+
+    def _connect(self):
+        # Opened on first use so that no connection is inherited across fork
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results "
+                "(key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+        return self._db
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            db = self._connect()
+            row = db.execute("SELECT value FROM results WHERE key = ? AND expires > ?", (key, now)).fetchone()
+            if row is not None:
+                db.execute("UPDATE results SET accessed = ? WHERE key = ?", (now, key))
+        return row[0] if row else None
+
+    def put(self, key, value, ttl):
+        """
+        Store a value and return how many entries were evicted to make room.
+        """
+        now = time.time()
+        with self._lock:
+            db = self._connect()
+            db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)", (key, value, now + ttl, now))
+            evicted = db.execute("DELETE FROM results WHERE expires <= ?", (now,)).rowcount
+            evicted += db.execute(
+                "DELETE FROM results WHERE key IN "
+                "(SELECT key FROM results ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            ).rowcount
+        return evicted
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+class ResultCache:
+    """
+    Two-tier cache of JSON results: a least-recently-used memory tier bounded by the size of
+    the serialized results, and an optional SQLite tier with a TTL.
+
+    get_or_compute single-flights identical requests: while a key is being computed, other
+    callers wait for the same result instead of computing it again.
+    """
+
+    def __init__(self, max_bytes=RESULT_CACHE_MAX_BYTES, ttl=RESULT_CACHE_TTL_SECONDS,
+                 path=RESULT_CACHE_PATH, disk_max_entries=RESULT_CACHE_DISK_MAX_ENTRIES):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.disk = _DiskTier(path, disk_max_entries) if path else None
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._flights = SingleFlight()
+        self.counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "memory_evictions": 0,
+            "disk_evictions": 0,
+        }
+
+    def _memory_get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires <= time.time():
+            self._memory_drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _memory_drop(self, key):
+        _, value = self._entries.pop(key)
+        self._bytes -= len(value)
+
+    def _memory_put(self, key, value, expires):
+        if len(value) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._memory_drop(key)
+        self._entries[key] = (expires, value)
+        self._bytes += len(value)
+        while self._bytes > self.max_bytes:
+            self._memory_drop(next(iter(self._entries)))
+            self.counters["memory_evictions"] += 1
+
+    async def _disk_get(self, key):
+        if self.disk is None:
+            return None
+        value = await run_cpu_bound(self.disk.get, key)
+        if value is not None:
+            self.counters["disk_hits"] += 1
+            self._memory_put(key, value, time.time() + self.ttl)
+        return value
+
+    async def get(self, key):
+        value = self._memory_get(key)
+        if value is not None:
+            self.counters["memory_hits"] += 1
+        else:
+            value = await self._disk_get(key)
+        return json.loads(value) if value is not None else None
+
+    async def put(self, key, result):
+        await self._store(key, json.dumps(result).encode())
+
+    async def _store(self, key, value):
+        self._memory_put(key, value, time.time() + self.ttl)
+        if self.disk is not None:
+            self.counters["disk_evictions"] += await run_cpu_bound(self.disk.put, key, value, self.ttl)
+
+    async def get_or_compute(self, key, compute):
+        """
+        Return the cached result for `key`, or await compute() once for all concurrent callers.
+        Each caller gets its own copy of the result.
+        """
+        if key in self._flights:
+            self.counters["coalesced"] += 1
+            return json.loads(await self._flights.join(key))
+        value = self._memory_get(key)
+        if value is not None:
+            self.counters["memory_hits"] += 1
+            return json.loads(value)
+
+        async def load():
+            value = await self._disk_get(key)
+            if value is None:
+                self.counters["misses"] += 1
+                value = json.dumps(await compute()).encode()
+                await self._store(key, value)
+            return value
+
+        # Registered before the disk lookup so that callers arriving meanwhile wait for this one
+        return json.loads(await self._flights.run(key, load))
+
+    def stats(self):
+        return dict(
+            self.counters,
+            memory_entries=len(self._entries),
+            memory_bytes=self._bytes,
+            in_flight=len(self._flights),
+        )
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
+
+
+result_cache = ResultCache()
@@ -0,0 +1,57 @@
+import asyncio
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent computations of the same key: the first caller computes, and callers
+    arriving meanwhile wait for its result (or exception) instead of starting their own.
+    State is per process, like the caches that use it.
+    """
+
+    def __init__(self):
+        self._futures = {}
+
+    def __contains__(self, key):
+        return key in self._futures
+
+    def __len__(self):
+        return len(self._futures)
+
+    async def join(self, key):
+        """
+        Wait for the computation of `key` in flight. Cancelling the wait does not cancel it.
+        """
+        return await asyncio.shield(self._futures[key])
+
+    def start(self, key):
+        """
+        Register a computation of `key` and return its future; complete it with settle().
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._futures[key] = future
+        return future
+
+    async def settle(self, key, future, compute):
+        """
+        Await compute() and pass its result or exception on to the callers waiting on `future`.
+        """
+        try:
+            value = await compute()
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Waiters re-raise the exception; mark it retrieved in case there are none
+            future.exception()
+            raise
+        finally:
+            del self._futures[key]
+
+    async def run(self, key, compute):
+        """
+        Await compute() as the computation of `key`; callers of join() share its result.
+        """
+        return await self.settle(key, self.start(key), compute)
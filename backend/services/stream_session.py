@@ -0,0 +1,91 @@
+import os
+import numpy as np
+from services.audio_ingest import MAX_AUDIO_SECONDS, SAMPLING_RATE, AudioIngestError, AudioTooLarge
+from services.ctc_stitching import LogitStitcher
+from services.wav2vec_alignment import tokenize_sentence_ipa
+from services.wav2vec_service import align_phonemes, decode_phonemes, extract_sentence_words
+
+STREAM_WINDOW_SECONDS = float(os.environ.get("STREAM_WINDOW_SECONDS", 4))
+STREAM_OVERLAP_SECONDS = float(os.environ.get("STREAM_OVERLAP_SECONDS", 1))
+PCM_FORMATS = {"f32le": ("<f4", 1.0), "s16le": ("<i2", 32768.0)}
+
+
+class StreamSession:
+    """
+    Incremental pronunciation analysis of a recording that arrives in chunks.
+
+    Raw 16 kHz mono PCM is appended as the user speaks; every time a full window is
+    available it is transcribed (through the shared batching scheduler) and its stable
+    frames are committed, so by the end of the recording only the last window remains.
+    """
+
+    def __init__(self, sentence, sentence_ipa, scheduler, config, pcm_format="f32le", max_seconds=MAX_AUDIO_SECONDS):
+        if pcm_format not in PCM_FORMATS:
+            raise AudioIngestError(f"Unsupported PCM format {pcm_format!r}; expected one of {', '.join(PCM_FORMATS)}")
+        self.sentence = sentence
+        self.scheduler = scheduler
+        self.dtype, self.scale = PCM_FORMATS[pcm_format]
+        self.ipa_word_phonemes = tokenize_sentence_ipa(sentence_ipa)
+        self.sentence_words = extract_sentence_words(sentence)
+        self.stitcher = LogitStitcher(config, STREAM_WINDOW_SECONDS, STREAM_OVERLAP_SECONDS, SAMPLING_RATE)
+        self._audio = np.empty(int(max_seconds * SAMPLING_RATE), dtype=np.float32)
+        self._pending = b""
+        self.samples = 0
+
+    def append(self, data):
+        """
+        Add a chunk of raw PCM bytes. Chunks do not need to end on a sample boundary.
+        """
+        data = self._pending + data
+        usable = len(data) - len(data) % np.dtype(self.dtype).itemsize
+        self._pending = data[usable:]
+        chunk = np.frombuffer(data[:usable], dtype=self.dtype).astype(np.float32) / self.scale
+        if self.samples + len(chunk) > len(self._audio):
+            raise AudioTooLarge(f"Audio is longer than {len(self._audio) / SAMPLING_RATE:g} seconds")
+        self._audio[self.samples:self.samples + len(chunk)] = chunk
+        self.samples += len(chunk)
+
+    async def advance(self, final=False):
+        """
+        Transcribe every window that is ready. Returns True if new frames were committed.
+        """
+        committed = False
+        while (window := self.stitcher.next_window(self.samples, final)) is not None:
+            start, end, is_last = window
+            _, logits = await self.scheduler.transcribe(self._audio[start:end])
+            committed |= len(self.stitcher.add(start, logits, is_last)) > 0
+        return committed
+
+    def phonemes(self):
+        return decode_phonemes(self.stitcher.logits())
+
+    async def partial(self):
+        """
+        Phonemes committed so far and alignments of the words they already cover.
+        The last word that the phonemes reach may still be growing, so it is left out.
+        """
+        phonemes = self.phonemes()
+        covered = 0
+        total = 0
+        for word in self.ipa_word_phonemes:
+            total += len(word)
+            if total > len(phonemes):
+                break
+            covered += 1
+        word_alignments = []
+        if covered >= 2:
+            word_alignments = await align_phonemes(self.ipa_word_phonemes[:covered], phonemes, self.sentence_words)
+            word_alignments = word_alignments[:covered - 1]
+        return {"phonemes": ' '.join(phonemes), "word_alignments": word_alignments}
+
+    async def finish(self):
+        """
+        Transcribe the remaining audio and align the whole recording.
+        """
+        await self.advance(final=True)
+        phonemes = self.phonemes()
+        return {
+            "sentence": self.sentence,
+            "phonemes": ' '.join(phonemes),
+            "word_alignments": await align_phonemes(self.ipa_word_phonemes, phonemes, self.sentence_words),
+        }
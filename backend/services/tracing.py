@@ -0,0 +1,121 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from collections import deque
+from services.executors import run_cpu_bound
+
+# Payload logs are DEBUG; the default level keeps them off
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "WARNING").upper()
+TRACE_BUFFER_SIZE = int(os.environ.get("TRACE_BUFFER_SIZE", 200))
+# Fraction of traces also appended to TRACE_FILE (JSON lines); 0 or an empty path disables the file
+TRACE_SAMPLE_RATE = float(os.environ.get("TRACE_SAMPLE_RATE", 0))
+TRACE_FILE = os.environ.get("TRACE_FILE", "")
+TRACE_FILE_QUEUE = int(os.environ.get("TRACE_FILE_QUEUE", 1000))
+
+
+class _JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+_root = logging.getLogger("phonexa")
+if not _root.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(_JsonFormatter())
+    _root.addHandler(_handler)
+    _root.setLevel(LOG_LEVEL)
+    _root.propagate = False
+
+
+def get_logger(name):
+    return _root.getChild(name)
+
+
+def log_event(logger, level, event, **fields):
+    """
+    Log one JSON line with `fields`. Nothing is serialized when the level is disabled.
+    """
+    if logger.isEnabledFor(level):
+        logger.log(level, event, extra={"fields": fields})
+
+
+class TraceBuffer:
+    """
+    The last `size` request traces in memory, plus an optional sampled JSON-lines file.
+    File writes go through a bounded queue drained by a background task; traces are dropped
+    rather than slowing requests down when the queue is full.
+    """
+
+    def __init__(self, size=TRACE_BUFFER_SIZE, sample_rate=TRACE_SAMPLE_RATE, path=TRACE_FILE):
+        self._traces = deque(maxlen=size)
+        self.sample_rate = sample_rate if path else 0
+        self.path = path
+        self.dropped = 0
+        self._queue = None
+        self._writer = None
+
+    def record(self, kind, **fields):
+        trace = {"time": time.time(), "kind": kind, **fields}
+        self._traces.append(trace)
+        if self.sample_rate and random.random() < self.sample_rate:
+            self._enqueue(trace)
+
+    def _enqueue(self, trace):
+        if self._writer is None:
+            self._queue = asyncio.Queue(maxsize=TRACE_FILE_QUEUE)
+            self._writer = asyncio.create_task(self._write_loop())
+        try:
+            self._queue.put_nowait(trace)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def _append(self, traces):
+        with open(self.path, "a") as f:
+            for trace in traces:
+                f.write(json.dumps(trace, default=str, ensure_ascii=False) + "\n")
+
+    async def _write_loop(self):
+        while True:
+            traces = [await self._queue.get()]
+            while not self._queue.empty():
+                traces.append(self._queue.get_nowait())
+            try:
+                await run_cpu_bound(self._append, traces)
+            except OSError as e:
+                log_event(get_logger("tracing"), logging.WARNING, "trace_file_write_failed", error=str(e))
+
+    def recent(self, limit=None, kind=None):
+        """
+        Most recent traces first.
+        """
+        traces = [t for t in reversed(self._traces) if kind is None or t["kind"] == kind]
+        return traces[:limit] if limit else traces
+
+    def stats(self):
+        return {
+            "buffered": len(self._traces),
+            "capacity": self._traces.maxlen,
+            "sample_rate": self.sample_rate,
+            "file": self.path or None,
+            "dropped": self.dropped,
+        }
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.cancel()
+            self._writer = None
+
+
+trace_buffer = TraceBuffer()
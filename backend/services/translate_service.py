@@ -1,7 +1,89 @@
-from googletrans import Translator
+import os
+from abc import ABC, abstractmethod
+from services.result_cache import ResultCache, cache_key
 
-translator = Translator()
+# "google" (googletrans) or "stub", which needs no network and is meant for tests and offline development
+TRANSLATION_PROVIDER = os.environ.get("TRANSLATION_PROVIDER", "google")
+TRANSLATION_CACHE_MAX_BYTES = int(os.environ.get("TRANSLATION_CACHE_MAX_BYTES", 4 * 1024 * 1024))
+TRANSLATION_CACHE_TTL_SECONDS = float(os.environ.get("TRANSLATION_CACHE_TTL_SECONDS", 30 * 24 * 60 * 60))
+# SQLite file that keeps translations across restarts and shares them between workers; empty disables it
+TRANSLATION_CACHE_PATH = os.environ.get("TRANSLATION_CACHE_PATH", "")
+TRANSLATION_CACHE_DISK_MAX_ENTRIES = int(os.environ.get("TRANSLATION_CACHE_DISK_MAX_ENTRIES", 100000))
+TRANSLATION_MAX_BATCH = int(os.environ.get("TRANSLATION_MAX_BATCH", 50))
 
-def translate_to_hebrew(text: str) -> str:
-    result = translator.translate(text, src='en', dest='he')
-    return result.text
\ No newline at end of file
+
+class TranslationProvider(ABC):
+    """
+    Translates a batch of texts. Subclasses set `name` (part of the cache key) and implement translate.
+    """
+
+    name = None
+
+    @abstractmethod
+    async def translate(self, texts, src, dest):
+        """
+        Return the translations of `texts`, in order.
+        """
+
+
+class GoogleTranslateProvider(TranslationProvider):
+    name = "google"
+
+    async def translate(self, texts, src, dest):
+        # googletrans 4.0.2 is async, on the same httpx as llm_client
+        from googletrans import Translator
+        async with Translator() as translator:
+            return [result.text for result in await translator.translate(texts, src=src, dest=dest)]
+
+
+class StubTranslationProvider(TranslationProvider):
+    name = "stub"
+
+    async def translate(self, texts, src, dest):
+        return [f"[{dest}] {text}" for text in texts]
+
+
+_PROVIDERS = {provider.name: provider for provider in (GoogleTranslateProvider, StubTranslationProvider)}
+
+provider = _PROVIDERS[TRANSLATION_PROVIDER]()
+translation_cache = ResultCache(
+    max_bytes=TRANSLATION_CACHE_MAX_BYTES,
+    ttl=TRANSLATION_CACHE_TTL_SECONDS,
+    path=TRANSLATION_CACHE_PATH,
+    disk_max_entries=TRANSLATION_CACHE_DISK_MAX_ENTRIES,
+)
+
+
+def _key(text, src, dest):
+    return cache_key("translation", provider.name, src, dest, text)
+
+
+async def translate(text: str, src: str = "en", dest: str = "he") -> str:
+    """
+    Translate one text, from the cache when possible. Concurrent requests for the same text share one call.
+    """
+    text = text.strip()
+
+    async def compute():
+        return (await provider.translate([text], src, dest))[0]
+
+    return await translation_cache.get_or_compute(_key(text, src, dest), compute)
+
+
+async def translate_batch(texts, src: str = "en", dest: str = "he"):
+    """
+    Translate several texts with at most one provider call for the ones that are not cached.
+    """
+    texts = [text.strip() for text in texts]
+    translations = {}
+    for text in dict.fromkeys(texts):
+        translation = await translation_cache.get(_key(text, src, dest))
+        if translation is not None:
+            translations[text] = translation
+
+    missing = [text for text in dict.fromkeys(texts) if text not in translations]
+    if missing:
+        for text, translation in zip(missing, await provider.translate(missing, src, dest)):
+            translations[text] = translation
+            await translation_cache.put(_key(text, src, dest), translation)
+    return [translations[text] for text in texts]
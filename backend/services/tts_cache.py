@@ -0,0 +1,231 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from services.executors import run_cpu_bound
+from services.single_flight import SingleFlight
+
+TTS_MEMORY_CACHE_BYTES = int(os.environ.get("TTS_MEMORY_CACHE_BYTES", 16 * 1024 * 1024))
+# Directory for the on-disk tier, shared by workers; empty disables it
+TTS_CACHE_DIR = os.environ.get("TTS_CACHE_DIR", "tts_cache")
+TTS_DISK_CACHE_BYTES = int(os.environ.get("TTS_DISK_CACHE_BYTES", 256 * 1024 * 1024))
+
+
+def tts_key(text, voice, audio_format):
+    return hashlib.sha256(json.dumps([text, voice, audio_format]).encode()).hexdigest()
+
+
+class TtsCache:
+    """
+    Synthesized speech by (normalized text, voice, format). Entries are dicts with the encoded
+    "audio" bytes and the word "boundaries" reported by the synthesizer.
+
+    The memory tier is an LRU bounded by audio size. The disk tier keeps <key>.audio and
+    <key>.json files in `directory` and removes the least recently used ones once they
+    take more than `disk_bytes`. Files are written under a unique name and renamed into
+    place, so concurrent writers (other requests or workers) never see partial files.
+
+    Each worker keeps its own disk index, so with several workers the directory can grow
+    to about `disk_bytes` per worker before one of them evicts.
+    """
+
+    def __init__(self, memory_bytes=TTS_MEMORY_CACHE_BYTES, directory=TTS_CACHE_DIR, disk_bytes=TTS_DISK_CACHE_BYTES):
+        self.memory_bytes = memory_bytes
+        self.directory = directory
+        self.disk_bytes = disk_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        # The disk tier runs on the CPU threads; the lock guards its index and byte count
+        self._disk_lock = threading.Lock()
+        self._disk_index = None
+        self._disk_total = 0
+        self._flights = SingleFlight()
+        self._streams = set()
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "coalesced": 0, "memory_evictions": 0, "disk_evictions": 0}
+
+    def _memory_put(self, key, entry):
+        size = len(entry["audio"])
+        if size > self.memory_bytes:
+            return
+        if key in self._entries:
+            self._bytes -= len(self._entries.pop(key)["audio"])
+        self._entries[key] = entry
+        self._bytes += size
+        while self._bytes > self.memory_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted["audio"])
+            self.counters["memory_evictions"] += 1
+
+    def _path(self, key, suffix):
+        return os.path.join(self.directory, key + suffix)
+
+    def _load_index(self):
+        # Least recently used first, by file modification time (reads touch the file).
+        # Called with the disk lock held.
+        if self._disk_index is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        sizes = []
+        for e in os.scandir(self.directory):
+            # Dot-prefixed files are writes in progress, or left over from a crash
+            if e.name.endswith(".audio") and not e.name.startswith("."):
+                try:
+                    stat = e.stat()
+                except FileNotFoundError:
+                    continue
+                sizes.append((stat.st_mtime, e.name[:-len(".audio")], stat.st_size))
+        sizes.sort()
+        self._disk_index = OrderedDict((key, size) for _, key, size in sizes)
+        self._disk_total = sum(self._disk_index.values())
+
+    def _disk_get(self, key):
+        with self._disk_lock:
+            self._load_index()
+        try:
+            with open(self._path(key, ".audio"), "rb") as f:
+                audio = f.read()
+            with open(self._path(key, ".json")) as f:
+                boundaries = json.load(f)
+            os.utime(self._path(key, ".audio"))
+        except (OSError, ValueError):
+            # Missing, half-evicted by another worker, or unreadable: a miss
+            return None
+        with self._disk_lock:
+            if key in self._disk_index:
+                self._disk_index.move_to_end(key)
+        return {"audio": audio, "boundaries": boundaries}
+
+    def _disk_put(self, key, entry):
+        with self._disk_lock:
+            self._load_index()
+            for suffix, data in ((".json", json.dumps(entry["boundaries"]).encode()), (".audio", entry["audio"])):
+                temp = self._path(f".{key}.{uuid.uuid4().hex}", suffix)
+                with open(temp, "wb") as f:
+                    f.write(data)
+                os.replace(temp, self._path(key, suffix))
+            self._disk_total += len(entry["audio"]) - self._disk_index.pop(key, 0)
+            self._disk_index[key] = len(entry["audio"])
+            evicted = 0
+            while self._disk_total > self.disk_bytes and len(self._disk_index) > 1:
+                old, size = self._disk_index.popitem(last=False)
+                self._disk_total -= size
+                for suffix in (".audio", ".json"):
+                    try:
+                        os.remove(self._path(old, suffix))
+                    except FileNotFoundError:
+                        pass
+                evicted += 1
+        return evicted
+
+    async def get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.counters["memory_hits"] += 1
+            return entry
+        if self.directory:
+            entry = await run_cpu_bound(self._disk_get, key)
+            if entry is not None:
+                self.counters["disk_hits"] += 1
+                self._memory_put(key, entry)
+                return entry
+        return None
+
+    async def put(self, key, entry):
+        self._memory_put(key, entry)
+        if self.directory:
+            self.counters["disk_evictions"] += await run_cpu_bound(self._disk_put, key, entry)
+
+    async def get_or_synthesize(self, key, synthesize):
+        """
+        Return the cached entry for `key`, or await synthesize() once for all concurrent callers.
+        """
+        if key in self._flights:
+            self.counters["coalesced"] += 1
+            return await self._flights.join(key)
+        if key in self._entries:
+            return await self.get(key)
+
+        async def load():
+            entry = await self.get(key)
+            if entry is None:
+                self.counters["misses"] += 1
+                entry = await synthesize()
+                await self.put(key, entry)
+            return entry
+
+        return await self._flights.run(key, load)
+
+    async def stream(self, key, synthesis_events):
+        """
+        Yield ("boundary", dict) and ("audio", bytes) events for `key`. A cached entry is replayed
+        at once. Otherwise the events of synthesis_events() are passed on as they arrive and the
+        entry is stored when they end. Synthesis runs in its own task, so it still completes and
+        fills the cache if the caller stops listening, and concurrent callers wait for its result.
+        """
+        entry = None
+        if key not in self._flights:
+            entry = await self.get(key)
+        if entry is None and key in self._flights:
+            self.counters["coalesced"] += 1
+            entry = await self._flights.join(key)
+        if entry is not None:
+            for boundary in entry["boundaries"]:
+                yield "boundary", boundary
+            yield "audio", entry["audio"]
+            return
+
+        self.counters["misses"] += 1
+        queue = asyncio.Queue()
+        future = self._flights.start(key)
+        task = asyncio.create_task(self._flights.settle(key, future, lambda: self._tee(key, synthesis_events, queue)))
+        self._streams.add(task)
+        task.add_done_callback(self._stream_done)
+        while (event := await queue.get()) is not None:
+            yield event
+        await asyncio.shield(future)
+
+    async def _tee(self, key, synthesis_events, queue):
+        audio = bytearray()
+        boundaries = []
+        try:
+            async for kind, value in synthesis_events():
+                if kind == "audio":
+                    audio += value
+                else:
+                    boundaries.append(value)
+                queue.put_nowait((kind, value))
+            if not audio:
+                raise RuntimeError("TTS output missing or empty")
+            entry = {"audio": bytes(audio), "boundaries": boundaries}
+            await self.put(key, entry)
+            return entry
+        finally:
+            queue.put_nowait(None)
+
+    def _stream_done(self, task):
+        self._streams.discard(task)
+        # The listener gets the exception through the future; mark it retrieved in case it left
+        if not task.cancelled():
+            task.exception()
+
+    def pending(self, key):
+        return key in self._flights
+
+    def in_flight(self):
+        return len(self._flights)
+
+    def stats(self):
+        return dict(
+            self.counters,
+            memory_entries=len(self._entries),
+            memory_bytes=self._bytes,
+            disk_entries=len(self._disk_index) if self._disk_index is not None else None,
+            disk_bytes=self._disk_total,
+        )
+
+
+tts_cache = TtsCache()
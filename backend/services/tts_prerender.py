@@ -0,0 +1,95 @@
+import asyncio
+import logging
+import os
+import time
+from services.llm_client import llm_teacher
+from services.tracing import get_logger, log_event
+from services.tts_cache import tts_cache
+from services.tts_service import generate_tts_audio
+from services.wav2vec_alignment import tokenize_sentence_ipa
+
+# Background syntheses at once; foreground /tts requests never wait for these slots
+TTS_PRERENDER_CONCURRENCY = int(os.environ.get("TTS_PRERENDER_CONCURRENCY", 2))
+# Sentences waiting to be rendered; new ones are dropped when it is full
+TTS_PRERENDER_QUEUE = int(os.environ.get("TTS_PRERENDER_QUEUE", 32))
+# Sentences that waited longer than this are dropped: the user has probably moved on
+TTS_PRERENDER_MAX_AGE_SECONDS = float(os.environ.get("TTS_PRERENDER_MAX_AGE_SECONDS", 30))
+# Skip pre-rendering while this many syntheses are already in flight
+TTS_PRERENDER_MAX_IN_FLIGHT = int(os.environ.get("TTS_PRERENDER_MAX_IN_FLIGHT", 4))
+# Also warm LLMTeacher's phoneme audio for every word of the sentence's IPA
+TTS_PRERENDER_PHONEMES = os.environ.get("TTS_PRERENDER_PHONEMES", "1") == "1"
+
+logger = get_logger("tts_prerender")
+
+
+class TtsPrerenderer:
+    """
+    Renders speech for newly generated sentences into the TTS cache before the user asks for it.
+    Work is best effort and gives way to requests: sentences are dropped when the queue is
+    full, when they have waited too long, or when synthesis is already busy.
+    """
+
+    def __init__(self, concurrency=TTS_PRERENDER_CONCURRENCY, queue_size=TTS_PRERENDER_QUEUE):
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self._queue = None
+        self._workers = []
+        self.counters = {"queued": 0, "rendered": 0, "phonemes_rendered": 0, "dropped": 0, "failed": 0}
+
+    def submit(self, sentence, sentence_ipa=None):
+        """
+        Queue a sentence for pre-rendering. Returns False if it was dropped.
+        """
+        if not self._workers:
+            # The queue and workers belong to the running event loop, so they are created on first use.
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._workers = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+        try:
+            self._queue.put_nowait((time.monotonic(), sentence, sentence_ipa))
+        except asyncio.QueueFull:
+            self.counters["dropped"] += 1
+            return False
+        self.counters["queued"] += 1
+        return True
+
+    def _busy(self):
+        return tts_cache.in_flight() >= TTS_PRERENDER_MAX_IN_FLIGHT
+
+    async def _work(self):
+        while True:
+            queued_at, sentence, sentence_ipa = await self._queue.get()
+            if time.monotonic() - queued_at > TTS_PRERENDER_MAX_AGE_SECONDS or self._busy():
+                self.counters["dropped"] += 1
+                continue
+            try:
+                await generate_tts_audio(sentence)
+                self.counters["rendered"] += 1
+                if TTS_PRERENDER_PHONEMES and sentence_ipa:
+                    await self._render_phonemes(sentence_ipa)
+            except Exception as e:
+                self.counters["failed"] += 1
+                log_event(logger, logging.WARNING, "tts_prerender_failed", sentence=sentence, error=str(e))
+
+    async def _render_phonemes(self, sentence_ipa):
+        # The same words the alignment reports as IPA_word, which the frontend asks LLMTeacher to speak
+        words = ("".join(phonemes) for phonemes in tokenize_sentence_ipa(sentence_ipa))
+        for phonetic_word in dict.fromkeys(word for word in words if word):
+            if self._busy():
+                return
+            await llm_teacher.post("/generate-phoneme-audio", {"phonetic_word": phonetic_word})
+            self.counters["phonemes_rendered"] += 1
+
+    def stats(self):
+        return dict(
+            self.counters,
+            waiting=self._queue.qsize() if self._queue is not None else 0,
+            concurrency=self.concurrency,
+        )
+
+    def close(self):
+        for worker in self._workers:
+            worker.cancel()
+        self._workers = []
+
+
+tts_prerenderer = TtsPrerenderer()
@@ -1,6 +1,21 @@
 import os
 import re
+from services.executors import run_cpu_bound
+from services.mp3_frames import slice_mp3
+from services.tts_cache import tts_cache, tts_key
 
+TTS_VOICE = os.environ.get("TTS_VOICE", "en-US-AvaMultilingualNeural")
+# The output format Edge TTS always requests, and the media type to serve it as
+TTS_FORMAT = "audio-24khz-48kbitrate-mono-mp3"
+TTS_MEDIA_TYPE = "audio/mpeg"
+# Audio kept around a word clip, so that its first and last sounds are not cut off
+TTS_CLIP_PADDING_SECONDS = float(os.environ.get("TTS_CLIP_PADDING_SECONDS", 0.05))
+
+_WORD_CHARS = re.compile(r"[^\w']+")
+
+
+class UnknownWord(LookupError):
+    pass
 
 
 def process_sentence_for_tts(sentence: str) -> str:
@@ -24,16 +39,98 @@ def process_sentence_for_tts(sentence: str) -> str:
     return re.sub(r"<[^>]+>", "", s).strip()
 
 
-async def generate_tts_audio(sentence: str):
-    sentence = process_sentence_for_tts(sentence)
-    output_path = "output.wav"
-            # fallback to Edge TTS
-    text = sentence
+async def synthesis_events(text: str, voice: str = TTS_VOICE):
+    """
+    Run Edge TTS on `text`, yielding ("audio", MP3 bytes) and ("boundary", word boundary) events as they arrive.
+    """
     from edge_tts import Communicate
-    comm = Communicate(text=text, voice="en-US-AvaMultilingualNeural")
-    await comm.save(output_path)
+    comm = Communicate(text=text, voice=voice, boundary="WordBoundary")
+    async for message in comm.stream():
+        if message["type"] == "audio":
+            yield "audio", message["data"]
+        elif message["type"] == "WordBoundary":
+            yield "boundary", word_boundary(message)
+
+
+async def synthesize(text: str, voice: str = TTS_VOICE):
+    """
+    Collect the MP3 audio and the word boundaries (in seconds) of `text`.
+    """
+    audio = bytearray()
+    boundaries = []
+    async for kind, value in synthesis_events(text, voice):
+        if kind == "audio":
+            audio += value
+        else:
+            boundaries.append(value)
 
-    if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
+    if not audio:
         raise RuntimeError("TTS output missing or empty")
+    return {"audio": bytes(audio), "boundaries": boundaries}
+
+
+def word_boundary(message):
+    # Edge TTS reports offsets and durations in 100 ns ticks
+    return {
+        "text": message["text"],
+        "start": message["offset"] / 1e7,
+        "end": (message["offset"] + message["duration"]) / 1e7,
+    }
+
+
+def tts_id(sentence: str, voice: str = TTS_VOICE):
+    """
+    Cache key of the speech for `sentence`; also the id clients use to fetch its word boundaries.
+    """
+    return tts_key(process_sentence_for_tts(sentence), voice, TTS_FORMAT)
+
 
-    return output_path
\ No newline at end of file
+async def generate_tts_audio(sentence: str, voice: str = TTS_VOICE):
+    """
+    Speech for `sentence` as {"audio": MP3 bytes, "boundaries": [...]}, from the cache when possible.
+    """
+    text = process_sentence_for_tts(sentence)
+    return await tts_cache.get_or_synthesize(tts_id(sentence, voice), lambda: synthesize(text, voice))
+
+
+def stream_tts_events(sentence: str, voice: str = TTS_VOICE):
+    """
+    ("boundary", word boundary) and ("audio", MP3 bytes) events for `sentence` as Edge TTS
+    produces them (or all at once when cached). The complete audio and its word boundaries
+    are cached when synthesis ends.
+    """
+    text = process_sentence_for_tts(sentence)
+    return tts_cache.stream(tts_id(sentence, voice), lambda: synthesis_events(text, voice))
+
+
+async def stream_tts_audio(sentence: str, voice: str = TTS_VOICE):
+    """
+    Only the MP3 chunks of stream_tts_events.
+    """
+    async for kind, value in stream_tts_events(sentence, voice):
+        if kind == "audio":
+            yield value
+
+
+def _normalize_word(word):
+    return _WORD_CHARS.sub("", word).lower()
+
+
+async def word_clip(sentence: str, word: str, occurrence: int = 0, voice: str = TTS_VOICE):
+    """
+    MP3 audio of one word, cut from the speech for the whole sentence. Only the first request
+    for a sentence synthesizes it; every word after that is a cache lookup and a slice.
+    `occurrence` picks among repeated words (0 is the first). Raises UnknownWord when the
+    sentence's speech has no such word.
+    """
+    speech = await generate_tts_audio(sentence, voice)
+    matches = [b for b in speech["boundaries"] if _normalize_word(b["text"]) == _normalize_word(word)]
+    if not 0 <= occurrence < len(matches):
+        raise UnknownWord(f"'{word}' (occurrence {occurrence}) is not spoken in this sentence")
+    boundary = matches[occurrence]
+    return await run_cpu_bound(
+        slice_mp3,
+        speech["audio"],
+        boundary["start"] - TTS_CLIP_PADDING_SECONDS,
+        boundary["end"] + TTS_CLIP_PADDING_SECONDS,
+    )
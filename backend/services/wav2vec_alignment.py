@@ -1,188 +1,174 @@
+import re
+from functools import lru_cache
 import numpy as np
+from services.phoneme_inventory import IPA_FEATURES, PHONEME_EQUIVALENTS, phonetic_distance, encode, distance_matrix
 
 
-# Enhanced IPA_FEATURES dictionary with expanded vocabulary
-IPA_FEATURES = {
-    # Vowels
-    'ɪ': [1, 0, 1, 0, 0],  # Near-close near-front unrounded vowel
-    'i': [1, 0, 0, 0, 0],  # Close front unrounded vowel
-    'iː': [1, 0, 0, 0, 1], # Long close front unrounded vowel
-    'ɛ': [1, 2, 0, 0, 0],  # Open-mid front unrounded vowel
-    'e': [1, 1, 0, 0, 0],  # Close-mid front unrounded vowel
-    'æ': [1, 3, 0, 0, 0],  # Near-open front unrounded vowel
-    'ə': [1, 2, 1, 0, 0],  # Mid central vowel (schwa)
-    'ɚ': [1, 2, 1, 0, 2],  # R-colored schwa (same as ə but rhoticized)
-    'ɐ': [1, 3, 1, 0, 0],  # Near-open central vowel
-    'ʌ': [1, 2, 2, 0, 0],  # Open-mid back unrounded vowel
-    'ɑ': [1, 4, 2, 0, 0],  # Open back unrounded vowel
-    'ɑː': [1, 4, 2, 0, 1], # Long open back unrounded vowel
-    'ɒ': [1, 4, 2, 1, 0],  # Open back rounded vowel
-    'ɔ': [1, 3, 2, 1, 0],  # Open-mid back rounded vowel
-    'ɔː': [1, 3, 2, 1, 1], # Long open-mid back rounded vowel
-    'ʊ': [1, 0, 3, 1, 0],  # Near-close near-back rounded vowel
-    'u': [1, 0, 2, 1, 0],  # Close back rounded vowel
-    'uː': [1, 0, 2, 1, 1], # Long close back rounded vowel
-    'ᵻ': [1, 0, 1, 0, 0],  # Centralized i
-    'o': [1, 2, 2, 1, 0],  # Close-mid back rounded vowel
-    'a': [1, 4, 0, 0, 0],  # Open front unrounded vowel
-    'y': [1, 0, 0, 1, 0],  # Close front rounded vowel
-    'ø': [1, 1, 0, 1, 0],  # Close-mid front rounded vowel
-    'œ': [1, 2, 0, 1, 0],  # Open-mid front rounded vowel
-    'ɯ': [1, 0, 2, 0, 0],  # Close back unrounded vowel
-    # Diphthongs
-    'eɪ': [1, 1, 0, 0, 3],  # Diphthong type 1
-    'aɪ': [1, 4, 0, 0, 3],  # Diphthong type 2
-    'ɔɪ': [1, 3, 2, 1, 3],  # Diphthong type 3
-    'aʊ': [1, 3, 2, 1, 3],  # Diphthong type 4 - adjusted height to be closer to oʊ
-    'oʊ': [1, 2, 2, 1, 3],  # Diphthong type 5 - adjusted height to be closer to aʊ
-    'əʊ': [1, 2, 1, 0, 3],  # Diphthong type 6
-    # Rhoticized vowels - these are equivalent to vowel + r
-    'ɑːɹ': [1, 4, 2, 0, 2], # Rhoticized long open back unrounded vowel
-    'ɔːɹ': [1, 3, 2, 1, 2], # Rhoticized long open-mid back rounded vowel
-    'ɝ': [1, 2, 1, 0, 2],   # Rhoticized mid central vowel (same as ɚ)
-    'ər': [1, 2, 1, 0, 2],  # Explicit schwa + r (same as ɚ)
-    # Consonants
-    'p': [0, 0, 0, 0, 0],
-    'b': [0, 0, 0, 1, 0],
-    't': [0, 3, 0, 0, 0],
-    'd': [0, 3, 0, 1, 0],
-    'k': [0, 6, 0, 0, 0],
-    'ɡ': [0, 6, 0, 1, 0],
-    'g': [0, 6, 0, 1, 0],
-    'f': [0, 1, 2, 0, 0],
-    'v': [0, 1, 2, 1, 0],
-    'θ': [0, 2, 2, 0, 0],
-    'ð': [0, 2, 2, 1, 0],
-    's': [0, 3, 2, 0, 0],
-    'z': [0, 3, 2, 1, 0],
-    'ʃ': [0, 4, 2, 0, 0],
-    'ʒ': [0, 4, 2, 1, 0],
-    'h': [0, 7, 2, 0, 0],
-    'm': [0, 0, 1, 1, 0],
-    'n': [0, 3, 1, 1, 0],
-    'ŋ': [0, 6, 1, 1, 0],
-    'l': [0, 3, 4, 1, 0],
-    'ɹ': [0, 3, 3, 1, 0],
-    'r': [0, 3, 3, 1, 0],
-    'j': [0, 5, 3, 1, 0],
-    'w': [0, 0, 3, 1, 0],
-    # Affricates
-    'tʃ': [0, 4, 0, 0, 0],
-    'dʒ': [0, 4, 0, 1, 0],
-    # Special cases - syllabic consonants and compounds
-    'əl': [1, 2, 1, 0, 0],
-    'ən': [1, 2, 1, 0, 0],
-}
-
-# Phoneme equivalence mappings - these are considered the same sound
-PHONEME_EQUIVALENTS = {
-    'ɚ': ['ər', 'ɝ'],      # R-colored schwa variants
-    'ɝ': ['ɚ', 'ər'],      # R-colored schwa variants
-    'ər': ['ɚ', 'ɝ'],      # R-colored schwa variants
-    'r': ['ɹ'],            # R variants
-    'ɹ': ['r'],            # R variants
-    'g': ['ɡ'],            # G variants
-    'ɡ': ['g'],            # G variants
-    'i': ['iː'],           # Length variants (minor difference)
-    'iː': ['i'],
-    'u': ['uː'],
-    'uː': ['u'],
-    'ɑ': ['ɑː'],
-    'ɑː': ['ɑ'],
-    'ɔ': ['ɔː'],
-    'ɔː': ['ɔ'],
-}
-
-def phonetic_distance(a, b):
-    """
-    Calculate phonetic distance between two IPA symbols based on features.
-    Returns a value between 0 (identical) and 1 (maximally different)
-    """
-    if a == b:
-        return 0.0
-    
-    # Check if phonemes are equivalent (e.g., ɚ == ər)
-    if a in PHONEME_EQUIVALENTS and b in PHONEME_EQUIVALENTS.get(a, []):
-        return 0.0
-    if b in PHONEME_EQUIVALENTS and a in PHONEME_EQUIVALENTS.get(b, []):
-        return 0.0
-    
-    # Special case: Compare compound phonemes like "ər" to single phonemes like "ɚ"
-    # ər (2 chars) vs ɚ (1 char) - these are the same sound
-    if (a == 'ə' and b == 'ɚ') or (a == 'ɚ' and b == 'ə'):
-        return 0.15  # Very small penalty - nearly the same
-    
-    if a not in IPA_FEATURES or b not in IPA_FEATURES:
-        return 1.0
-    features_a = IPA_FEATURES[a]
-    features_b = IPA_FEATURES[b]
-    if features_a[0] != features_b[0]:
-        return 0.8
-    weights = [0.0, 0.3, 0.3, 0.2, 0.2]
-    total_weight = sum(weights[1:])
-    weighted_diff = 0
-    for i in range(1, len(features_a)):
-        if features_a[i] != features_b[i]:
-            feature_range = 8 if i == 1 and features_a[0] == 0 else \
-                            5 if i == 1 and features_a[0] == 1 else \
-                            5 if i == 2 and features_a[0] == 0 else \
-                            3 if i == 2 and features_a[0] == 1 else 2
-            diff = abs(features_a[i] - features_b[i]) / feature_range
-            weighted_diff += weights[i] * diff
-    distance = weighted_diff / total_weight
-    if features_a[0] == 0 and features_b[0] == 0 and features_a[1] == features_b[1] and features_a[2] == features_b[2]:
-        if features_a[3] != features_b[3]:
-            distance *= 0.7
-    if features_a[0] == 1 and features_b[0] == 1:
-        height_diff = abs(features_a[1] - features_b[1])
-        if height_diff == 1:
-            distance *= 0.8
-    return min(1.0, distance)
+_TIE_TOLERANCE = 1e-9
+TOKENIZE_CACHE_SIZE = 1024
+
+def _as_ids(phonemes, unknown):
+    if isinstance(phonemes, np.ndarray) and phonemes.dtype.kind == 'i':
+        return phonemes
+    return encode(phonemes, unknown)
+
+def _prefix_edit_distances(a, b):
+    """
+    Feature-weighted Levenshtein distances between `a` and every prefix b[:j], for j = 0..len(b).
+    This is the last row of the edit-distance table, built one row per reference phoneme:
+    the diagonal and vertical moves are vectorized over the whole row, and the horizontal
+    (insertion) chain row[j] = min(row[j-1] + 1, ...) is a running minimum of row[k] - k.
+    """
+    costs = distance_matrix(a, b)
+    offsets = np.arange(len(b)+1, dtype=float)
+    row = offsets.copy()
+    for i in range(1, len(a)+1):
+        step = np.empty(len(b)+1)
+        step[0] = i
+        np.minimum(row[1:] + 1, row[:-1] + costs[i-1], out=step[1:])
+        row = np.minimum.accumulate(step - offsets) + offsets
+    return row
 
 def levenshtein_with_features(a, b):
     """
     Enhanced Levenshtein distance using phonetic feature distances.
+    `a` and `b` are phoneme ID arrays (see phoneme_inventory.encode); lists of IPA symbols are encoded on the fly.
     """
-    dp = np.zeros((len(a)+1, len(b)+1), dtype=float)
-    for i in range(len(a)+1):
-        dp[i][0] = i
-    for j in range(len(b)+1):
-        dp[0][j] = j
-    for i in range(1, len(a)+1):
-        for j in range(1, len(b)+1):
-            cost = phonetic_distance(a[i-1], b[j-1])
-            dp[i][j] = min(
-                dp[i-1][j] + 1,
-                dp[i][j-1] + 1,
-                dp[i-1][j-1] + cost
-            )
-    return dp[len(a)][len(b)]
+    unknown = {}
+    a = _as_ids(a, unknown)
+    b = _as_ids(b, unknown)
+    return float(_prefix_edit_distances(a, b)[len(b)])
 
-def align_words_to_phonemes_dp(ipa_word_phonemes, predicted_phonemes, beam_width=5):
+def _variant_prefix_edit_distances(refs, b):
     """
-    Aligns IPA words to predicted phonemes using dynamic programming with beam search.
+    Prefix distances (see _prefix_edit_distances) against the closest of several accepted pronunciations.
     """
-    N = len(ipa_word_phonemes)
-    M = len(predicted_phonemes)
+    distances = _prefix_edit_distances(refs[0], b)
+    for ref in refs[1:]:
+        np.minimum(distances, _prefix_edit_distances(ref, b), out=distances)
+    return distances
+
+def _segment_cost_table(refs, hyp_ids, starts):
+    """
+    Distances between one reference word and every span hyp_ids[k:j] with k in `starts` and k < j.
+    `refs` holds the word's accepted pronunciations; a span costs the distance to the closest one.
+    Spans that share a start share one table pass, so each start costs a single Levenshtein run per pronunciation.
+    Entry [k, j] is inf for spans that were not evaluated.
+    """
+    M = len(hyp_ids)
+    costs = np.full((M+1, M+1), np.inf)
+    for k in starts:
+        costs[k, k+1:] = _variant_prefix_edit_distances(refs, hyp_ids[k:])[1:]
+    return costs
+
+def _full_forward(ref_ids, hyp_ids):
+    """
+    Exhaustive word-to-span DP: every word may cover any non-empty span after its predecessor.
+    Returns (dp, bp, word_costs), where word_costs[i][j] is the cost of word i over the span bp[i][j]:j.
+    """
+    N = len(ref_ids)
+    M = len(hyp_ids)
+    dp = np.full((N+1, M+1), -np.inf)
+    bp = np.full((N+1, M+1), -1, dtype=int)
+    word_costs = np.full((N+1, M+1), np.inf)
+    dp[0][0] = 0
+    for i in range(1, N+1):
+        starts = np.flatnonzero(dp[i-1][:M] != -np.inf)
+        costs = _segment_cost_table(ref_ids[i-1], hyp_ids, starts)
+        # scores[k, j] = dp[i-1][k] - cost of word i over predicted_phonemes[k:j]
+        scores = dp[i-1][:, None] - costs
+        # Take the earliest start among candidates that tie up to float rounding,
+        # so equal-cost splits do not depend on summation order.
+        best = scores.max(axis=0)
+        best_k = np.argmax(scores >= best - _TIE_TOLERANCE, axis=0)
+        best_score = scores[best_k, np.arange(M+1)]
+        reachable = best_score != -np.inf
+        dp[i][reachable] = best_score[reachable]
+        bp[i][reachable] = best_k[reachable]
+        # Only the chosen span's cost is needed later, so the per-word table is dropped here
+        word_costs[i][reachable] = costs[best_k, np.arange(M+1)][reachable]
+    return dp, bp, word_costs
+
+def _pruned_forward(ref_ids, hyp_ids, beam_width, slack):
+    """
+    Banded word-to-span DP.
+    - Word i covers between len(ref) - slack and len(ref) + slack predicted phonemes (at least one),
+      with len(ref) first scaled by M / total reference length when that stretches the range, so
+      that insertions or deletions spread over the sentence do not push every word out of it.
+    - Its start lies within a band around the offset predicted by the cumulative reference length,
+      scaled to the number of predicted phonemes. The band is `slack` plus the length mismatch
+      between reference and prediction, since that bounds how far insertions can shift a word.
+    - Each cell (i, j) considers only its top-`beam_width` predecessors by accumulated score.
+    Work per word is bounded by band * (len(ref) + slack) instead of growing with M^2.
+    """
+    N = len(ref_ids)
+    M = len(hyp_ids)
+    # Positions follow the primary pronunciation; span lengths allow for every variant
+    ref_lengths = [len(refs[0]) for refs in ref_ids]
+    total_ref = sum(ref_lengths)
+    scale = M / total_ref if total_ref else 0.0
+    band = slack + abs(M - total_ref)
     dp = np.full((N+1, M+1), -np.inf)
     bp = np.full((N+1, M+1), -1, dtype=int)
+    word_costs = np.full((N+1, M+1), np.inf)
     dp[0][0] = 0
+    expected_start = 0.0
     for i in range(1, N+1):
-        for j in range(1, M+1):
-            candidates = []
-            for k in range(j):
-                if dp[i-1][k] == -np.inf:
+        L = ref_lengths[i-1]
+        min_len = max(1, int(np.floor(min(len(ref) for ref in ref_ids[i-1]) * min(scale, 1))) - slack)
+        max_len = int(np.ceil(max(len(ref) for ref in ref_ids[i-1]) * max(scale, 1))) + slack
+        lo = max(0, int(np.floor(expected_start - band)))
+        hi = min(M - 1, int(np.ceil(expected_start + band)))
+        expected_start += L * scale
+        prev = dp[i-1]
+        # Best accumulated score first; the stable sort keeps the earliest start on ties.
+        starts = sorted((k for k in range(lo, hi+1) if prev[k] != -np.inf), key=lambda k: -prev[k])
+        kept = np.zeros(M+1, dtype=int)
+        for k in starts:
+            distances = _variant_prefix_edit_distances(ref_ids[i-1], hyp_ids[k:k+max_len])
+            for length in range(min_len, len(distances)):
+                j = k + length
+                if kept[j] >= beam_width:
                     continue
-                ref = ipa_word_phonemes[i-1]
-                hyp = predicted_phonemes[k:j]
-                sim = -levenshtein_with_features(ref, hyp)
-                score = dp[i-1][k] + sim
-                candidates.append((score, k))
-            if candidates:
-                candidates.sort(key=lambda x: x[0], reverse=True)
-                best_score, best_k = candidates[0]
-                dp[i][j] = best_score
-                bp[i][j] = best_k
+                kept[j] += 1
+                score = prev[k] - distances[length]
+                if score > dp[i][j] + _TIE_TOLERANCE or (score >= dp[i][j] - _TIE_TOLERANCE and k < bp[i][j]):
+                    dp[i][j] = score
+                    bp[i][j] = k
+                    word_costs[i][j] = distances[length]
+    return dp, bp, word_costs
+
+def align_words_to_phonemes_dp(ipa_word_phonemes, predicted_phonemes, beam_width=5, slack=3, strict=True, word_variants=None):
+    """
+    Aligns IPA words to predicted phonemes using dynamic programming with beam search.
+    The search is banded around each word's expected position and length and keeps the
+    top `beam_width` predecessors per cell (see _pruned_forward); beam_width=None runs the
+    exhaustive DP. If the pruned search cannot cover all predicted phonemes, strict mode
+    retries it with the slack widened by the whole length mismatch, so that a single word may
+    absorb every insertion, and only then falls back to the exhaustive DP. Without strict the
+    alignment fails.
+    word_variants optionally lists, per word, other accepted pronunciations (phoneme lists).
+    A word is scored against its closest pronunciation, reported as "best_variant".
+    """
+    N = len(ipa_word_phonemes)
+    M = len(predicted_phonemes)
+    pronunciations = [
+        [word] + list(word_variants[i] if word_variants and i < len(word_variants) else [])
+        for i, word in enumerate(ipa_word_phonemes)
+    ]
+    # Unknown symbols are numbered per call, so client input never grows the shared distance table
+    unknown = {}
+    ref_ids = [[encode(ref, unknown) for ref in refs] for refs in pronunciations]
+    hyp_ids = encode(predicted_phonemes, unknown)
+    if beam_width is None:
+        dp, bp, word_costs = _full_forward(ref_ids, hyp_ids)
+    else:
+        dp, bp, word_costs = _pruned_forward(ref_ids, hyp_ids, beam_width, slack)
+        if dp[N][M] == -np.inf and strict:
+            mismatch = abs(M - sum(len(refs[0]) for refs in ref_ids))
+            dp, bp, word_costs = _pruned_forward(ref_ids, hyp_ids, beam_width, slack + mismatch)
+        if dp[N][M] == -np.inf and strict:
+            dp, bp, word_costs = _full_forward(ref_ids, hyp_ids)
     if dp[N][M] == -np.inf:
         return [{
             "error": "Alignment failed",
@@ -194,49 +180,68 @@ def align_words_to_phonemes_dp(ipa_word_phonemes, predicted_phonemes, beam_width
     i, j = N, M
     while i > 0:
         k = bp[i][j]
-        ref = ipa_word_phonemes[i-1]
+        refs = pronunciations[i-1]
         hyp = predicted_phonemes[k:j]
         
-        # Calculate the phonetic distance for this specific word
-        distance = levenshtein_with_features(ref, hyp)
+        # The phonetic distance for this specific word was already computed in the forward pass
+        distance = word_costs[i][j]
+        best = 0
+        if len(refs) > 1:
+            # Only the winning span is rescored to find which pronunciation it matched
+            best = int(np.argmin([levenshtein_with_features(ref, hyp_ids[k:j]) for ref in ref_ids[i-1]]))
+        ref = refs[best]
         
         # Calculate a similarity score (0-100%) - higher is better
         max_length = max(len(ref), len(hyp))
         similarity = 100 * (1 - (distance / max_length)) if max_length > 0 else 0
         
-        alignment.append({
-            "IPA_word": ''.join(ref),
+        entry = {
+            "IPA_word": ''.join(refs[0]),
             "user_phonemes": hyp,
             "similarity": similarity,
-        })
+        }
+        if len(refs) > 1:
+            entry["best_variant"] = ''.join(ref)
+        alignment.append(entry)
         i -= 1
         j = k
     alignment.reverse()
     return alignment
 
+def build_ipa_tokenizer(symbols):
+    """
+    Compile a longest-match tokenizer for the given symbol inventory.
+    Multi-character symbols are tried longest first, then any single character,
+    which is what a left-to-right scan over the inventory would produce.
+    """
+    multi_char_symbols = [k for k in symbols if len(k) > 1]
+    multi_char_symbols.sort(key=len, reverse=True)
+    return re.compile('|'.join([re.escape(symbol) for symbol in multi_char_symbols] + ['.']), re.DOTALL)
+
+_IPA_TOKEN = build_ipa_tokenizer(IPA_FEATURES)
+
+# Stress marks, syllable breaks and apostrophes are not phonemes
+_IPA_STRIP = str.maketrans('', '', "'ˈˌ.")
+
+def clean_sentence_ipa(sentence_ipa):
+    """
+    Remove stress marks and punctuation from an IPA sentence.
+    """
+    return sentence_ipa.translate(_IPA_STRIP)
+
+@lru_cache(maxsize=TOKENIZE_CACHE_SIZE)
+def _tokenize_cached(ipa_text):
+    return tuple(tuple(_IPA_TOKEN.findall(word)) for word in ipa_text.split())
+
 def tokenize_ipa(ipa_text):
     """
     Properly tokenize IPA text, preserving multi-character phonemes.
     """
-    multi_char_symbols = [k for k in IPA_FEATURES.keys() if len(k) > 1]
-    multi_char_symbols.sort(key=len, reverse=True)
-    tokens = []
-    words = ipa_text.split()
-    for word in words:
-        word_tokens = []
-        i = 0
-        while i < len(word):
-            matched = False
-            for symbol in multi_char_symbols:
-                if word[i:].startswith(symbol):
-                    word_tokens.append(symbol)
-                    i += len(symbol)
-                    matched = True
-                    break
-            if not matched:
-                word_tokens.append(word[i])
-                i += 1
-        tokens.append(word_tokens)
-    
-
-    return tokens
\ No newline at end of file
+    return [list(word) for word in _tokenize_cached(ipa_text)]
+
+def tokenize_sentence_ipa(sentence_ipa):
+    """
+    Clean and tokenize a sentenceIPA string. Results are memoized on the cleaned string,
+    since the same sentences are scored over and over.
+    """
+    return tokenize_ipa(clean_sentence_ipa(sentence_ipa))
@@ -1,69 +1,282 @@
+import logging
 import os
-import torch
-import soundfile as sf
-import subprocess
 import re
-from transformers import Wav2Vec2Processor, Wav2Vec2ForCTC
-from services.wav2vec_alignment import tokenize_ipa, align_words_to_phonemes_dp  # Import alignment functions
+import numpy as np
+import torch
+from services.wav2vec_alignment import clean_sentence_ipa, tokenize_ipa, tokenize_sentence_ipa, align_words_to_phonemes_dp  # Import alignment functions
+from services.model_manager import model_manager
+from services.ctc_alignment import CtcForcedAligner
+from services.ctc_stitching import LogitStitcher
+from services.executors import run_alignment, run_cpu_bound
+from services.audio_ingest import SAMPLING_RATE, AudioIngestError
+from services.tracing import get_logger, log_event
 
-MODEL_NAME = "facebook/wav2vec2-lv-60-espeak-cv-ft"
-MODEL_CACHE = os.environ.get("TRANSFORMERS_CACHE", None)
+ALIGNMENT_BEAM_WIDTH = int(os.environ.get("ALIGNMENT_BEAM_WIDTH", 5))
+ALIGNMENT_SLACK = int(os.environ.get("ALIGNMENT_SLACK", 3))
+ALIGNMENT_STRICT = os.environ.get("ALIGNMENT_STRICT", "1") != "0"
+# "dp" aligns decoded phoneme strings to words; "ctc" force-aligns the expected phonemes against the logits
+SCORING_MODES = ("dp", "ctc")
+SCORING_MODE = os.environ.get("SCORING_MODE", "dp")
 
-print(f"Loading processor and model... Cache: {MODEL_CACHE}")
-processor = Wav2Vec2Processor.from_pretrained(MODEL_NAME, cache_dir=MODEL_CACHE)
-model = Wav2Vec2ForCTC.from_pretrained(MODEL_NAME, cache_dir=MODEL_CACHE)
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-model.to(device)
-model.eval()
+# Recordings longer than CHUNK_THRESHOLD_SECONDS run in overlapping windows to bound attention memory
+CHUNK_THRESHOLD_SECONDS = float(os.environ.get("CHUNK_THRESHOLD_SECONDS", 20))
+CHUNK_WINDOW_SECONDS = float(os.environ.get("CHUNK_WINDOW_SECONDS", 10))
+CHUNK_OVERLAP_SECONDS = float(os.environ.get("CHUNK_OVERLAP_SECONDS", 1))
+# Voice activity detection before inference
+VAD_ENABLED = os.environ.get("VAD_ENABLED", "1") != "0"
+VAD_FRAME_SECONDS = 0.02
+# A frame is speech if it is louder than VAD_THRESHOLD_DB (dBFS) and within VAD_DYNAMIC_RANGE_DB of the loudest frame
+VAD_THRESHOLD_DB = float(os.environ.get("VAD_THRESHOLD_DB", -50))
+VAD_DYNAMIC_RANGE_DB = float(os.environ.get("VAD_DYNAMIC_RANGE_DB", 35))
+VAD_PADDING_SECONDS = float(os.environ.get("VAD_PADDING_SECONDS", 0.2))
+VAD_MAX_PAUSE_SECONDS = float(os.environ.get("VAD_MAX_PAUSE_SECONDS", 0.4))
+VAD_MIN_SPEECH_SECONDS = float(os.environ.get("VAD_MIN_SPEECH_SECONDS", 0.15))
 
-def convert_to_wav(input_path, output_path):
-    try:
-        subprocess.run(
-            ["ffmpeg", "-i", input_path, "-ar", "16000", "-ac", "1", output_path],
-            check=True
-        )
-        print(f"Converted {input_path} to {output_path}")
-    except subprocess.CalledProcessError as e:
-        raise ValueError(f"Failed to convert file to WAV: {e}")
-
-async def convert_audio_file(audio_path, sentenceIPA, sentence):
-    wav_path = f"converted_{os.path.basename(audio_path)}.wav"
+_ctc_aligner = None
+logger = get_logger("wav2vec")
+
+
+class NoSpeechDetected(AudioIngestError):
+    """
+    Raised when a recording has too little speech to be worth scoring.
+    """
+    status_code = 422
+
+
+def detect_speech(audio_input):
+    """
+    Energy-based voice activity detection on 20 ms frames.
+
+    Leading and trailing non-speech is dropped. VAD_PADDING_SECONDS is kept around speech so that
+    quiet onsets and final consonants survive, and longer gaps between padded speech are shortened
+    to VAD_MAX_PAUSE_SECONDS. Returns the samples to keep as a list of (start, end) segments of
+    the original waveform. Raises NoSpeechDetected for near-silent recordings.
+    """
+    frame = int(VAD_FRAME_SECONDS * SAMPLING_RATE)
+    n_frames = -(-len(audio_input) // frame)
+    if n_frames == 0:
+        raise NoSpeechDetected("The recording is empty")
+    frames = np.zeros(n_frames * frame, dtype=np.float32)
+    frames[:len(audio_input)] = audio_input
+    frames = frames.reshape(n_frames, frame)
+    # Remove DC offset per frame so that a biased microphone does not look like speech
+    rms = np.sqrt(np.mean(np.square(frames - frames.mean(axis=1, keepdims=True)), axis=1))
+    level = 20 * np.log10(np.maximum(rms, 1e-10))
+    threshold = max(VAD_THRESHOLD_DB, level.max() - VAD_DYNAMIC_RANGE_DB)
+    speech = level > threshold
+    if speech.sum() * VAD_FRAME_SECONDS < VAD_MIN_SPEECH_SECONDS:
+        raise NoSpeechDetected("No speech detected in the recording; check the microphone and try again")
+
+    # Extend speech by the padding on both sides
+    pad = int(round(VAD_PADDING_SECONDS / VAD_FRAME_SECONDS))
+    speech_frames = np.flatnonzero(speech)
+    keep = np.zeros(n_frames + 1, dtype=int)
+    np.add.at(keep, np.maximum(speech_frames - pad, 0), 1)
+    np.add.at(keep, np.minimum(speech_frames + pad + 1, n_frames), -1)
+    keep = np.cumsum(keep[:-1]) > 0
+
+    # Contiguous runs of kept frames, then shorten the pauses between them
+    edges = np.flatnonzero(np.diff(np.r_[0, keep.astype(np.int8), 0]))
+    runs = edges.reshape(-1, 2)
+    max_pause = int(round(VAD_MAX_PAUSE_SECONDS / VAD_FRAME_SECONDS))
+    segments = []
+    for start, end in runs:
+        if segments and start - segments[-1][1] <= max_pause:
+            segments[-1][1] = end
+            continue
+        if segments:
+            # Keep half of the allowed pause on each side of a long one
+            segments[-1][1] += max_pause // 2
+            start -= max_pause - max_pause // 2
+        segments.append([start, end])
+    return [(start * frame, min(end * frame, len(audio_input))) for start, end in segments]
+
+
+def apply_vad(audio_input):
+    """
+    Trim a waveform to its speech (see detect_speech).
+    Returns the trimmed waveform and a summary with the kept segments in seconds.
+    """
+    original_seconds = len(audio_input) / SAMPLING_RATE
+    if not VAD_ENABLED:
+        return audio_input, {"original_seconds": original_seconds, "trimmed_seconds": original_seconds, "segments": [(0.0, original_seconds)]}
+    segments = detect_speech(audio_input)
+    trimmed = np.concatenate([audio_input[start:end] for start, end in segments])
+    return trimmed, {
+        "original_seconds": original_seconds,
+        "trimmed_seconds": len(trimmed) / SAMPLING_RATE,
+        "segments": [(float(start / SAMPLING_RATE), float(end / SAMPLING_RATE)) for start, end in segments],
+    }
+
+
+def to_original_time(speech, seconds):
+    """
+    Map a time in the trimmed waveform back to the recording the user made.
+    """
+    position = 0.0
+    for start, end in speech["segments"]:
+        if seconds <= position + (end - start):
+            return start + seconds - position
+        position += end - start
+    return speech["segments"][-1][1]
+
+
+def extract_sentence_words(sentence):
+    """
+    The English words of a sentence, in order, without apostrophes.
+    """
+    return [re.sub(r"'", "", w) for w in re.findall(r"\b[\w']+\b", sentence)]
+
+def decode_phonemes(logits):
+    """
+    Greedy CTC decoding of [frames, vocab] logits into a list of phonemes.
+    """
+    if len(logits) == 0:
+        return []
+    predicted_ids = torch.argmax(logits, dim=-1)
+    return model_manager.processor.batch_decode([predicted_ids])[0].split()
+
+def parse_ipa_variants(sentenceIPA, variants):
+    """
+    Normalize accepted alternative pronunciations to one list of cleaned IPA strings per word
+    of sentenceIPA. `variants` is either a list of alternative sentence transcriptions (with
+    the same number of words as sentenceIPA) or a list with one list of alternatives per word.
+    """
+    words = clean_sentence_ipa(sentenceIPA).split()
+    if not variants:
+        return None
+    if not isinstance(variants, list):
+        raise ValueError("IPA variants must be a list")
+    per_word = [[] for _ in words]
+    if all(isinstance(v, str) for v in variants):
+        for sentence_variant in variants:
+            variant_words = clean_sentence_ipa(sentence_variant).split()
+            if len(variant_words) != len(words):
+                raise ValueError(f"IPA variant {sentence_variant!r} has {len(variant_words)} words, expected {len(words)}")
+            for alternatives, word in zip(per_word, variant_words):
+                alternatives.append(word)
+    elif all(isinstance(v, list) and all(isinstance(w, str) for w in v) for v in variants):
+        if len(variants) != len(words):
+            raise ValueError(f"Got IPA variants for {len(variants)} words, expected {len(words)}")
+        for alternatives, word_variants in zip(per_word, variants):
+            alternatives.extend(w for w in map(clean_sentence_ipa, word_variants) if w.strip())
+    else:
+        raise ValueError("IPA variants must be a list of sentences or a list of per-word lists")
+    # Drop alternatives that repeat the primary pronunciation or each other
+    return [
+        [w for i, w in enumerate(alternatives) if w != word and w not in alternatives[:i]]
+        for word, alternatives in zip(words, per_word)
+    ]
+
+async def align_phonemes(ipa_word_phonemes, phonemes, sentence_words, word_variants=None):
+    """
+    Align predicted phonemes to the tokenized reference words and label each entry with its English word.
+    word_variants optionally lists other accepted pronunciations per word (see parse_ipa_variants).
+    """
+    tokenized_variants = None
+    if word_variants:
+        tokenized_variants = [[sum(tokenize_ipa(w), []) for w in alternatives] for alternatives in word_variants]
+    word_alignments = await run_alignment(
+        align_words_to_phonemes_dp, ipa_word_phonemes, phonemes,
+        beam_width=ALIGNMENT_BEAM_WIDTH, slack=ALIGNMENT_SLACK, strict=ALIGNMENT_STRICT,
+        word_variants=tokenized_variants,
+    )
+    for entry, word in zip(word_alignments, sentence_words):
+        entry["user_phonemes"] = ''.join(entry["user_phonemes"])
+        entry["word"] = word
+    return word_alignments
+
+def get_ctc_aligner():
+    global _ctc_aligner
+    if _ctc_aligner is None:
+        _ctc_aligner = CtcForcedAligner(model_manager.processor.tokenizer, model_manager.engine.config, SAMPLING_RATE)
+    return _ctc_aligner
+
+async def force_align(logits, sentenceIPA, sentence_words, word_variants=None):
+    """
+    CTC forced alignment of sentenceIPA against the logits, or None if the recording is too short for it.
+    """
+    return await run_cpu_bound(get_ctc_aligner().align, logits, sentenceIPA, sentence_words, word_variants)
+
+async def transcribe_chunked(scheduler, audio_input):
+    """
+    Transcribe a long waveform one fixed-length window at a time and stitch the logits
+    (see services.ctc_stitching), so peak memory depends on the window, not the recording.
+    Returns (transcription, logits) like InferenceScheduler.transcribe.
+    """
+    stitcher = LogitStitcher(model_manager.engine.config, CHUNK_WINDOW_SECONDS, CHUNK_OVERLAP_SECONDS, SAMPLING_RATE)
+    while (window := stitcher.next_window(len(audio_input), final=True)) is not None:
+        start, end, is_last = window
+        _, logits = await scheduler.transcribe(audio_input[start:end])
+        stitcher.add(start, logits, is_last)
+    logits = stitcher.logits()
+    predicted_ids = torch.argmax(logits, dim=-1)
+    return model_manager.processor.batch_decode([predicted_ids])[0], logits
+
+async def transcribe_audio(audio_input):
+    """
+    Trim silence from a 16 kHz mono waveform (see services.audio_ingest) and run the model on it.
+    Returns (transcription, logits, speech) for score_transcription, where speech describes the trimming.
+    """
+    scheduler = model_manager.require_scheduler()
+    # Near-silent recordings are rejected here, before they reach the model
+    audio_input, speech = await run_cpu_bound(apply_vad, audio_input)
+    log_event(logger, logging.DEBUG, "transcribing", speech_seconds=speech["trimmed_seconds"], audio_seconds=speech["original_seconds"])
+    # Process audio using model (batched with other in-flight requests)
+    if speech["trimmed_seconds"] > CHUNK_THRESHOLD_SECONDS:
+        transcription, logits = await transcribe_chunked(scheduler, audio_input)
+    else:
+        transcription, logits = await scheduler.transcribe(audio_input)
+    return transcription, logits, speech
+
+async def score_transcription(transcription, logits, sentenceIPA, sentence, scoring_mode=None, word_variants=None, speech=None):
+    """
+    Align a transcription and its logits to sentenceIPA. Scoring the same recording against
+    other sentences or pronunciations only repeats this step, not the forward pass.
+    scoring_mode is "dp" or "ctc" (default SCORING_MODE); "ctc" entries also carry time spans and confidence.
+    word_variants optionally lists other accepted pronunciations per word (see parse_ipa_variants).
+    speech (from transcribe_audio) maps time spans back to the untrimmed recording.
+    """
+    scoring_mode = scoring_mode or SCORING_MODE
+    if scoring_mode not in SCORING_MODES:
+        raise ValueError(f"Unknown scoring mode {scoring_mode!r}; expected one of {', '.join(SCORING_MODES)}")
     try:
-        print(f"Processing audio file: {audio_path}")
-        convert_to_wav(audio_path, wav_path)
-        print(f"Converted audio file to WAV: {wav_path}")
-        print(f"Loading audio from file: {wav_path}")
-        audio_input, sample_rate = sf.read(wav_path)
-        print("Loaded audio, performing transcription...")
-
-        # Process audio using model
-        input_values = processor(audio_input, sampling_rate=sample_rate, return_tensors="pt").input_values.to(device)
-        with torch.no_grad():
-            logits = model(input_values).logits
-        predicted_ids = torch.argmax(logits, dim=-1)
-        transcription = processor.batch_decode(predicted_ids)[0]
         phonemes = transcription.split()
-        # Remove unwanted characters
-        sentenceIPA = sentenceIPA.replace("'", "").replace("ˈ", "").replace("ˌ", "").replace(".", "")
-        print("Original SentenceIPA:\n", sentenceIPA)
-        print("Phonemes from the recording:\n", phonemes)
-
-        ipa_word_phonemes = tokenize_ipa(sentenceIPA)
-        print("Tokenized IPA Sentence:\n", ipa_word_phonemes)
-        word_alignments = align_words_to_phonemes_dp(ipa_word_phonemes, phonemes)
-        sentence_words = [re.sub(r"'", "", w) for w in re.findall(r"\b[\w']+\b", sentence)] # extract the words themselves
-        for entry, word in zip(word_alignments, sentence_words):
-            entry["user_phonemes"] = ''.join(entry["user_phonemes"])
-            entry["word"] = word
-
-        return {
+        log_event(logger, logging.DEBUG, "scoring", sentence_ipa=sentenceIPA, phonemes=phonemes, scoring_mode=scoring_mode)
+
+        sentence_words = extract_sentence_words(sentence)
+        word_alignments = None
+        if scoring_mode == "ctc":
+            word_alignments = await force_align(logits, sentenceIPA, sentence_words, word_variants)
+            if word_alignments is None:
+                log_event(logger, logging.INFO, "forced_alignment_fallback", frames=len(logits))
+            elif speech is not None:
+                for entry in word_alignments:
+                    for span in [entry] + entry["phonemes"]:
+                        if span["start"] is not None:
+                            span["start"] = to_original_time(speech, span["start"])
+                            span["end"] = to_original_time(speech, span["end"])
+        if word_alignments is None:
+            # Strips stress marks and punctuation before tokenizing
+            ipa_word_phonemes = tokenize_sentence_ipa(sentenceIPA)
+            word_alignments = await align_phonemes(ipa_word_phonemes, phonemes, sentence_words, word_variants)
+
+        result = {
             "sentence": sentence,
             "word_alignments": word_alignments
         }
+        if speech is not None:
+            result["audio_seconds"] = speech["original_seconds"]
+            result["speech_seconds"] = speech["trimmed_seconds"]
+        return result
         
     except Exception as e:
-        print(f"Error in transcribe_audio_to_phonemes_from_array: {e}")
+        log_event(logger, logging.ERROR, "scoring_failed", error=str(e))
         raise
-    finally:
-        if os.path.exists(wav_path):
-            os.remove(wav_path)
\ No newline at end of file
+
+async def convert_audio_file(audio_input, sentenceIPA, sentence, scoring_mode=None, word_variants=None):
+    """
+    Transcribe a 16 kHz mono waveform (see services.audio_ingest) and align it to sentenceIPA.
+    """
+    transcription, logits, speech = await transcribe_audio(audio_input)
+    return await score_transcription(transcription, logits, sentenceIPA, sentence, scoring_mode, word_variants, speech)
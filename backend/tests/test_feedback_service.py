@@ -0,0 +1,90 @@
+import asyncio
+import pytest
+from services import feedback_service
+from services.feedback_service import local_feedback
+from services.result_cache import ResultCache
+
+SENTENCE = "The cat sat on the mat."
+WORDS = ["The", "cat", "sat", "on", "the", "mat"]
+
+
+def result(similarities):
+    return {
+        "sentence": SENTENCE,
+        "word_alignments": [
+            {"word": word, "IPA_word": word.lower(), "user_phonemes": ["x"], "similarity": similarity}
+            for word, similarity in zip(WORDS, similarities)
+        ],
+    }
+
+
+def red(word):
+    return f"<font color='red'>{word}</font>"
+
+
+@pytest.mark.parametrize("similarities, score, highlighted, try_saying", [
+    # Nothing below the threshold
+    ([100, 90, 85, 99, 100, 86], 100, SENTENCE, ["PERFECT!"]),
+    # 85 is still fine, just below is not
+    ([100, 84.9, 85, 100, 100, 100], 90, f"The {red('cat')} sat on the mat.", ["cat"]),
+    ([100, 50, 100, 100, 100, 60], 80, f"The {red('cat')} sat on the {red('mat')}.", ["cat", "mat"]),
+    # Only the worst three count, reported in sentence order
+    ([10, 80, 20, 70, 30, 84], 70, f"{red('The')} cat {red('sat')} on {red('the')} mat.", ["The", "sat", "the"]),
+    ([0, 0, 0, 0, 0, 0], 70, f"{red('The')} {red('cat')} {red('sat')} on the mat.", ["The", "cat", "sat"]),
+])
+def test_local_feedback(similarities, score, highlighted, try_saying):
+    feedback = local_feedback(result(similarities))
+    assert feedback["score"] == score
+    assert feedback["highlighted_sentence"] == highlighted
+    if try_saying == ["PERFECT!"]:
+        assert feedback["try_saying"] == try_saying
+    else:
+        assert [entry["en_word"] for entry in feedback["try_saying"]] == try_saying
+        assert all(entry["right_word"] == entry["en_word"].lower() for entry in feedback["try_saying"])
+
+
+def test_local_feedback_alignment_error():
+    feedback = local_feedback({"sentence": SENTENCE, "word_alignments": [{"error": "Alignment failed"}]})
+    assert feedback == {"score": 0, "highlighted_sentence": SENTENCE, "try_saying": []}
+
+
+def test_enrichment_state_is_shared_between_workers(tmp_path, monkeypatch):
+    # Two workers: separate memory tiers and task tables, one SQLite tier
+    path = str(tmp_path / "results.sqlite3")
+    workers = [ResultCache(path=path), ResultCache(path=path)]
+    release = None
+
+    async def post_json(route, payload):
+        await release.wait()
+        return {"score": 42}
+
+    monkeypatch.setattr(feedback_service.llm_teacher, "post_json", post_json)
+
+    def switch_to(worker, tasks):
+        monkeypatch.setattr(feedback_service, "result_cache", workers[worker])
+        monkeypatch.setattr(feedback_service, "_enrichment_tasks", tasks)
+
+    async def main():
+        nonlocal release
+        release = asyncio.Event()
+        first_tasks = {}
+        switch_to(0, first_tasks)
+        await feedback_service.start_enrichment("a1", {})
+
+        switch_to(1, {})
+        assert await feedback_service.get_enrichment("a1") == ("pending", None)
+        assert await feedback_service.get_enrichment("other") == ("unknown", None)
+
+        switch_to(0, first_tasks)
+        release.set()
+        assert await feedback_service.wait_enrichment("a1") == ("ready", {"score": 42})
+
+        switch_to(1, {})
+        assert await feedback_service.get_enrichment("a1") == ("ready", {"score": 42})
+        assert await feedback_service.wait_enrichment("a1") == ("ready", {"score": 42})
+
+    try:
+        asyncio.run(main())
+    finally:
+        for cache in workers:
+            cache.close()
@@ -0,0 +1,76 @@
+import asyncio
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from routes import translate as translate_routes
+from services import translate_service
+from services.result_cache import ResultCache
+from services.translate_service import TRANSLATION_MAX_BATCH, StubTranslationProvider
+
+
+class CountingProvider(StubTranslationProvider):
+    def __init__(self):
+        self.calls = []
+
+    async def translate(self, texts, src, dest):
+        self.calls.append(list(texts))
+        return await super().translate(texts, src, dest)
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    provider = CountingProvider()
+    cache = ResultCache()
+    monkeypatch.setattr(translate_service, "provider", provider)
+    monkeypatch.setattr(translate_service, "translation_cache", cache)
+    monkeypatch.setattr(translate_routes, "translation_cache", cache)
+    return provider
+
+
+@pytest.fixture
+def client(provider):
+    app = FastAPI()
+    app.include_router(translate_routes.router, prefix="/translate")
+    return TestClient(app)
+
+
+def test_translate_is_cached(provider):
+    async def main():
+        first = await translate_service.translate(" Hello ")
+        again = await translate_service.translate("Hello")
+        other = await translate_service.translate("Hello", dest="fr")
+        return first, again, other
+
+    assert asyncio.run(main()) == ("[he] Hello", "[he] Hello", "[fr] Hello")
+    assert provider.calls == [["Hello"], ["Hello"]]
+    stats = translate_service.translation_cache.stats()
+    assert (stats["misses"], stats["memory_hits"]) == (2, 1)
+
+
+def test_concurrent_translations_share_one_call(provider):
+    async def main():
+        return await asyncio.gather(*(translate_service.translate("Good morning") for _ in range(5)))
+
+    assert asyncio.run(main()) == ["[he] Good morning"] * 5
+    assert provider.calls == [["Good morning"]]
+
+
+def test_batch_endpoint(client, provider):
+    client.post("/translate/", json={"sentence": "The cat."})
+    response = client.post("/translate/batch", json={"sentences": ["The cat.", "A dog.", " A dog. ", "Hi"]})
+    assert response.status_code == 200
+    assert response.json() == {"translations": ["[he] The cat.", "[he] A dog.", "[he] A dog.", "[he] Hi"]}
+    # The cached sentence and the duplicate are not sent to the provider
+    assert provider.calls == [["The cat."], ["A dog.", "Hi"]]
+
+    response = client.post("/translate/batch", json={"sentences": ["Hi", "The cat."], "dest": "fr"})
+    assert response.json() == {"translations": ["[fr] Hi", "[fr] The cat."]}
+    client.post("/translate/batch", json={"sentences": ["A dog.", "Hi"]})
+    assert len(provider.calls) == 3
+    assert client.get("/translate/cache-stats").json()["memory_entries"] == 5
+
+
+def test_batch_endpoint_limit(client, provider):
+    response = client.post("/translate/batch", json={"sentences": ["Hi"] * (TRANSLATION_MAX_BATCH + 1)})
+    assert response.status_code == 413
+    assert provider.calls == []
@@ -0,0 +1,103 @@
+import random
+import numpy as np
+from services import phoneme_inventory
+from services.phoneme_inventory import IPA_FEATURES, phonetic_distance
+from services.wav2vec_alignment import align_words_to_phonemes_dp, levenshtein_with_features
+
+SYMBOLS = sorted(IPA_FEATURES)
+
+
+def reference_levenshtein(a, b):
+    # The original O(nm) table, kept as the specification of levenshtein_with_features
+    dp = np.zeros((len(a)+1, len(b)+1), dtype=float)
+    for i in range(len(a)+1):
+        dp[i][0] = i
+    for j in range(len(b)+1):
+        dp[0][j] = j
+    for i in range(1, len(a)+1):
+        for j in range(1, len(b)+1):
+            cost = phonetic_distance(a[i-1], b[j-1])
+            dp[i][j] = min(dp[i-1][j] + 1, dp[i][j-1] + 1, dp[i-1][j-1] + cost)
+    return dp[len(a)][len(b)]
+
+
+def random_word(rng, min_len=1, max_len=6):
+    return [rng.choice(SYMBOLS) for _ in range(rng.randint(min_len, max_len))]
+
+
+def mispronounce(rng, words, max_edits_per_word=1):
+    """
+    Predicted phonemes for `words`: substitutions plus at most `max_edits_per_word` insertions or deletions per word.
+    """
+    predicted = []
+    for word in words:
+        spoken = [rng.choice(SYMBOLS) if rng.random() < 0.2 else p for p in word]
+        for _ in range(rng.randint(0, max_edits_per_word)):
+            if rng.random() < 0.5 and len(spoken) > 1:
+                del spoken[rng.randrange(len(spoken))]
+            else:
+                spoken.insert(rng.randrange(len(spoken) + 1), rng.choice(SYMBOLS))
+        predicted.extend(spoken)
+    return predicted
+
+
+def total_cost(words, alignment):
+    return sum(levenshtein_with_features(word, entry["user_phonemes"]) for word, entry in zip(words, alignment))
+
+
+def test_levenshtein_matches_reference():
+    rng = random.Random(0)
+    for _ in range(500):
+        a = random_word(rng, 0, 8)
+        b = random_word(rng, 0, 8)
+        assert abs(levenshtein_with_features(a, b) - reference_levenshtein(a, b)) < 1e-9
+
+
+def test_unknown_symbols_are_local_to_each_call():
+    table = phoneme_inventory._distance_table
+    rng = random.Random(2)
+    unknown = [chr(0x4E00 + i) for i in range(20)]
+    for _ in range(200):
+        a = [rng.choice(SYMBOLS + unknown) for _ in range(rng.randint(0, 6))]
+        b = [rng.choice(SYMBOLS + unknown) for _ in range(rng.randint(0, 6))]
+        assert abs(levenshtein_with_features(a, b) - reference_levenshtein(a, b)) < 1e-9
+    alignment = align_words_to_phonemes_dp([["你", "好"], ["s", "æ", "t"]], ["你", "好", "s", "æ", "t"])
+    assert [entry["similarity"] for entry in alignment] == [100, 100]
+    assert phoneme_inventory._distance_table is table
+    assert len(phoneme_inventory.PHONEME_IDS) == len(IPA_FEATURES)
+
+
+def test_pruned_alignment_matches_exhaustive():
+    rng = random.Random(1)
+    for _ in range(200):
+        words = [random_word(rng) for _ in range(rng.randint(1, 6))]
+        predicted = mispronounce(rng, words)
+        exhaustive = align_words_to_phonemes_dp(words, predicted, beam_width=None)
+        pruned = align_words_to_phonemes_dp(words, predicted, strict=False)
+        assert "error" not in pruned[0]
+        assert [e["user_phonemes"] for e in pruned] == [e["user_phonemes"] for e in exhaustive] or \
+            abs(total_cost(words, pruned) - total_cost(words, exhaustive)) < 1e-9
+
+
+def test_spread_insertions_align_without_fallback():
+    # Extra phonemes all over the sentence stretch every word beyond len + slack
+    rng = random.Random(3)
+    for extra in (150, 400):
+        words = [random_word(rng, 3, 8) for _ in range(20)]
+        predicted = mispronounce(rng, words)
+        for _ in range(extra):
+            predicted.insert(rng.randrange(len(predicted) + 1), rng.choice(SYMBOLS))
+        pruned = align_words_to_phonemes_dp(words, predicted, strict=False)
+        assert "error" not in pruned[0]
+        exhaustive = align_words_to_phonemes_dp(words, predicted, beam_width=None)
+        assert total_cost(words, pruned) <= 1.05 * total_cost(words, exhaustive)
+
+
+def test_strict_retries_with_wider_slack():
+    # Every word needs at least one phoneme, but the last one would need two within slack=0
+    words = [["s"], ["æ"], ["t"], ["d", "ɔ", "ɡ", "z"]]
+    predicted = ["s", "æ", "t", "d"]
+    assert "error" in align_words_to_phonemes_dp(words, predicted, slack=0, strict=False)[0]
+    alignment = align_words_to_phonemes_dp(words, predicted, slack=0)
+    assert alignment == align_words_to_phonemes_dp(words, predicted, beam_width=None)
+    assert [entry["user_phonemes"] for entry in alignment] == [["s"], ["æ"], ["t"], ["d"]]
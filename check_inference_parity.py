@@ -0,0 +1,90 @@
+"""
+Compare an inference engine against the float32 PyTorch baseline.
+
+    python check_inference_parity.py samples/ --engine torch-int8
+    python check_inference_parity.py samples/ --engine onnx --onnx-path model_cache/wav2vec2-lv-60-espeak-cv-ft.int8.onnx
+
+`samples/manifest.json` lists the recordings to score:
+
+    [{"audio": "cat.webm", "sentence": "The cat sat.", "sentence_ipa": "ðə kæt sæt"}, ...]
+
+For every sample the decoded phoneme strings and the per-word `similarity` scores of both
+engines are compared. Exits non-zero when a word's similarity moves by more than
+--max-similarity-delta or fewer than --min-exact-match of the transcriptions are identical.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import torch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from services.audio_ingest import SAMPLING_RATE, decode_audio
+from services.inference_engine import ENGINES, ONNX_MODEL_PATH, load_engine
+from services.wav2vec_alignment import align_words_to_phonemes_dp, tokenize_sentence_ipa
+
+CACHE_DIR = "./model_cache"
+
+
+def transcribe(processor, engine, waveform):
+    inputs = processor(waveform, sampling_rate=SAMPLING_RATE, return_tensors="pt", return_attention_mask=True)
+    start = time.perf_counter()
+    logits = engine.logits(inputs.input_values, inputs.attention_mask)
+    elapsed = time.perf_counter() - start
+    transcription = processor.batch_decode(torch.argmax(logits, dim=-1))[0]
+    return transcription, elapsed
+
+
+def score(transcription, sentence_ipa):
+    alignment = align_words_to_phonemes_dp(tokenize_sentence_ipa(sentence_ipa), transcription.split(), beam_width=None)
+    return [entry.get("similarity", 0.0) for entry in alignment]
+
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument("samples", help="directory containing manifest.json and the audio files")
+parser.add_argument("--engine", choices=[e for e in ENGINES if e != "torch"], required=True)
+parser.add_argument("--onnx-path", default=ONNX_MODEL_PATH)
+parser.add_argument("--max-similarity-delta", type=float, default=5.0)
+parser.add_argument("--min-exact-match", type=float, default=0.9)
+args = parser.parse_args()
+
+with open(os.path.join(args.samples, "manifest.json")) as f:
+    manifest = json.load(f)
+
+print("Loading float32 baseline...")
+baseline = load_engine("torch", cache_dir=CACHE_DIR)
+print(f"Loading {args.engine} engine...")
+candidate = load_engine(args.engine, cache_dir=CACHE_DIR, onnx_path=args.onnx_path)
+
+exact = 0
+worst_delta = 0.0
+timings = {"baseline": 0.0, "candidate": 0.0}
+for sample in manifest:
+    with open(os.path.join(args.samples, sample["audio"]), "rb") as f:
+        waveform = asyncio.run(decode_audio(f.read()))
+    expected, baseline_time = transcribe(*baseline, waveform)
+    actual, candidate_time = transcribe(*candidate, waveform)
+    timings["baseline"] += baseline_time
+    timings["candidate"] += candidate_time
+
+    deltas = [abs(a - b) for a, b in zip(score(expected, sample["sentence_ipa"]), score(actual, sample["sentence_ipa"]))]
+    sample_delta = max(deltas, default=0.0)
+    worst_delta = max(worst_delta, sample_delta)
+    exact += expected == actual
+    status = "same" if expected == actual else "DIFF"
+    print(f"[{status}] {sample['audio']}: max similarity delta {sample_delta:.2f} ({baseline_time:.2f}s -> {candidate_time:.2f}s)")
+    if expected != actual:
+        print(f"    baseline:  {expected}\n    {args.engine}: {actual}")
+
+exact_rate = exact / len(manifest) if manifest else 1.0
+print(f"\nIdentical transcriptions: {exact}/{len(manifest)} ({exact_rate:.0%})")
+print(f"Largest per-word similarity delta: {worst_delta:.2f}")
+print(f"Forward pass time: baseline {timings['baseline']:.2f}s, {args.engine} {timings['candidate']:.2f}s")
+
+if worst_delta > args.max_similarity_delta or exact_rate < args.min_exact_match:
+    print("Parity check FAILED")
+    sys.exit(1)
+print("Parity check passed")
@@ -0,0 +1,69 @@
+"""
+Export the speech model to ONNX for the backend's INFERENCE_ENGINE=onnx mode.
+
+    python export_onnx.py             # float32 graph
+    python export_onnx.py --quantize  # additionally write an int8 graph (*.int8.onnx)
+
+Run download_model.py first. Point ONNX_MODEL_PATH at the int8 graph to serve it.
+"""
+import argparse
+import os
+import torch
+from transformers import Wav2Vec2ForCTC
+
+MODEL_NAME = "facebook/wav2vec2-lv-60-espeak-cv-ft"
+CACHE_DIR = "./model_cache"
+OUTPUT_PATH = os.path.join(CACHE_DIR, "wav2vec2-lv-60-espeak-cv-ft.onnx")
+
+
+class LogitsOnly(torch.nn.Module):
+    """
+    Expose (input_values, attention_mask) -> logits, the interface OnnxEngine runs.
+    """
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_values, attention_mask):
+        return self.model(input_values, attention_mask=attention_mask).logits
+
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument("--output", default=OUTPUT_PATH)
+parser.add_argument("--opset", type=int, default=17)
+parser.add_argument("--quantize", action="store_true", help="also write a dynamically quantized int8 graph")
+args = parser.parse_args()
+
+print(f"Loading {MODEL_NAME} from {CACHE_DIR}...")
+model = Wav2Vec2ForCTC.from_pretrained(MODEL_NAME, cache_dir=CACHE_DIR)
+model.eval()
+
+# One second of audio; batch and sample axes are dynamic
+input_values = torch.randn(1, 16000)
+attention_mask = torch.ones(1, 16000, dtype=torch.int64)
+
+print(f"Exporting to {args.output}...")
+torch.onnx.export(
+    LogitsOnly(model).eval(),
+    (input_values, attention_mask),
+    args.output,
+    input_names=["input_values", "attention_mask"],
+    output_names=["logits"],
+    dynamic_axes={
+        "input_values": {0: "batch", 1: "samples"},
+        "attention_mask": {0: "batch", 1: "samples"},
+        "logits": {0: "batch", 1: "frames"},
+    },
+    opset_version=args.opset,
+    dynamo=False,
+)
+
+if args.quantize:
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantized_path = os.path.splitext(args.output)[0] + ".int8.onnx"
+    print(f"Quantizing to {quantized_path}...")
+    quantize_dynamic(args.output, quantized_path, weight_type=QuantType.QInt8)
+
+print("Export finished. Verify it with check_inference_parity.py before serving it.")